@@ -0,0 +1,204 @@
+#Scaling benchmarks for `Model` and `Visualizer`. Every case is timed per phase: integration, post-processing, extrema and
+#plotting. Peak memory is measured in a separate tracemalloc pass so that tracing does not distort the timings.
+#Results are written as JSON and can be compared against a saved baseline to catch regressions.
+#Run from the repository root with: python -m benchmarks.model_benchmarks [--quick] [--output FILE] [--baseline FILE]
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+
+from matplotlib import colormaps
+from matplotlib.colors import to_hex
+from typing import Dict, List, Tuple, Callable, Optional
+
+from src.model import Model, uniform_mutation_matrix
+from src.visualizer import Visualizer
+from src.config import monster_colors, brief_monster_labels_16
+
+PHASES: List[str] = ["integration", "post_processing", "extrema", "plotting"]
+
+DIMENSIONS: List[int] = [2, 4, 8, 16, 32, 64, 128, 256]
+SAMPLING_FREQUENCIES: List[int] = [10**2, 10**3, 10**4, 10**5, 10**6]
+
+
+def cases(quick: bool = False, seed: int = 0) -> List[Dict]:
+
+    #Dimension scaling at a fixed sampling frequency, sampling frequency scaling at 16 strategies, each with and without
+    #mutation, plus the 16-strategy monster configuration used by `Visualizer`'s defaults.
+    dimensions: List[int] = DIMENSIONS[:5] if quick else DIMENSIONS
+    sampling_frequencies: List[int] = SAMPLING_FREQUENCIES[:3] if quick else SAMPLING_FREQUENCIES
+    rng = np.random.default_rng(seed)
+    found: List[Dict] = []
+
+    def add(name: str, dimension: int, sampling_frequency: int, mutation: bool) -> None:
+        game_matrix: np.ndarray = rng.random((dimension, dimension))
+        initial_population: np.ndarray = rng.random(dimension)
+        initial_population /= initial_population.sum()
+        found.append({"name": "{}{}".format(name, ", mutation" if mutation else ""),
+                      "dimension": dimension,
+                      "sampling_frequency": sampling_frequency,
+                      "mutation": mutation,
+                      "game_matrix": game_matrix,
+                      "initial_population": initial_population,
+                      "mutation_matrix": uniform_mutation_matrix(dimension, 0.01) if mutation else None})
+
+    for mutation in (False, True):
+        for dimension in dimensions:
+            add("dimension {}".format(dimension), dimension, 1000, mutation)
+        for sampling_frequency in sampling_frequencies:
+            add("sampling frequency {}".format(sampling_frequency), 16, sampling_frequency, mutation)
+
+    #`config` holds the monster labels and colors but no payoffs, so the monster game uses a seeded 16 x 16 matrix.
+    add("monster game", len(brief_monster_labels_16), 1000, False)
+    return found
+
+
+def line_styles(dimension: int) -> Tuple[List[str], List[str]]:
+    if dimension <= len(brief_monster_labels_16):
+        return (monster_colors, brief_monster_labels_16)
+
+    colormap = colormaps["turbo"]
+    return ([to_hex(colormap(i / (dimension - 1))) for i in range(dimension)], [str(i) for i in range(dimension)])
+
+
+def phases(case: Dict, solver: str, directory: str) -> List[Tuple[str, Callable[[Dict], None]]]:
+
+    #Each phase stores what later phases need in `state`, so the phases can be timed one at a time.
+    def integration(state: Dict) -> None:
+        state["model"] = Model(case["game_matrix"], case["initial_population"], case["sampling_frequency"],
+                               case["mutation_matrix"], lazy=True, solver=solver)
+        state["model"].replicator_dynamics
+
+    def post_processing(state: Dict) -> None:
+        model: Model = state["model"]
+        model.population_evolution
+        model.derivative_evolution
+        model.avg_fitness_evolution
+        model.fitness_evolution
+
+    def extrema(state: Dict) -> None:
+        model: Model = state["model"]
+        model.population_percentage_extrema
+        model.population_derivative_extrema
+        model.fitness_extrema
+
+    def plotting(state: Dict) -> None:
+        line_colors, line_labels = line_styles(case["dimension"])
+        visualizer = Visualizer(state["model"], line_colors=line_colors, line_labels=line_labels)
+        visualizer.percentage_plot(legend=case["dimension"] <= 16, save_to=os.path.join(directory, "benchmark.png"))
+
+    return [("integration", integration), ("post_processing", post_processing), ("extrema", extrema), ("plotting", plotting)]
+
+
+def measure(case: Dict, solver: str, repeats: int, directory: str) -> Dict:
+    seconds: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+
+    for _ in range(repeats):
+        state: Dict = {}
+        for phase, run_phase in phases(case, solver, directory):
+            start: float = time.perf_counter()
+            run_phase(state)
+            seconds[phase].append(time.perf_counter() - start)
+
+    #Peak memory of each phase above what was already allocated when it started.
+    peak_bytes: Dict[str, int] = {}
+    state = {}
+    tracemalloc.start()
+    for phase, run_phase in phases(case, solver, directory):
+        tracemalloc.reset_peak()
+        before: int = tracemalloc.get_traced_memory()[0]
+        run_phase(state)
+        peak_bytes[phase] = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    best: Dict[str, float] = {phase: min(times) for phase, times in seconds.items()}
+    return {"name": case["name"],
+            "dimension": case["dimension"],
+            "sampling_frequency": case["sampling_frequency"],
+            "mutation": case["mutation"],
+            "seconds": best,
+            "total_seconds": sum(best.values()),
+            "peak_bytes": peak_bytes,
+            "total_peak_bytes": max(peak_bytes.values())}
+
+
+def run(quick: bool = False, repeats: int = 3, solver: str = "native", only: Optional[str] = None) -> Dict:
+    results: List[Dict] = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for case in cases(quick):
+            if only is not None and only not in case["name"]:
+                continue
+            results.append(measure(case, solver, repeats, directory))
+            print("{name:<34}{total_seconds:>10.4f} s{mb:>10.1f} MB".format(mb=results[-1]["total_peak_bytes"] / 2**20, **results[-1]),
+                  file=sys.stderr)
+
+    return {"solver": solver,
+            "repeats": repeats,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "results": results}
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float = 0.25) -> List[Dict]:
+
+    #Per case and phase timings that got slower than the baseline by more than `tolerance` (relative).
+    #Very short phases are skipped, since their timings are mostly noise.
+    previous: Dict[str, Dict] = {result["name"]: result for result in baseline["results"]}
+    regressions: List[Dict] = []
+
+    for result in report["results"]:
+        if result["name"] not in previous:
+            continue
+        for phase in PHASES:
+            old: float = previous[result["name"]]["seconds"][phase]
+            new: float = result["seconds"][phase]
+            if max(old, new) >= 1e-3 and new > (1 + tolerance) * old:
+                regressions.append({"name": result["name"], "phase": phase, "baseline": old, "seconds": new, "ratio": new / old})
+
+    return regressions
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Model and Visualizer scaling.")
+    parser.add_argument("--quick", action="store_true", help="Skip the largest dimensions and sampling frequencies.")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats per case; the fastest is reported.")
+    parser.add_argument("--solver", choices=["nashpy", "native"], default="native")
+    parser.add_argument("--only", help="Only run cases whose name contains this text.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    parser.add_argument("--baseline", help="Compare against a JSON report written earlier with --output.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Relative slowdown reported as a regression.")
+    options = parser.parse_args(arguments)
+
+    report: Dict = run(options.quick, options.repeats, options.solver, options.only)
+
+    if options.output is not None:
+        with open(options.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    print("{:<34}".format("case") + "".join("{:>17}".format(phase) for phase in PHASES) + "{:>12}".format("peak MB"))
+    for result in report["results"]:
+        print("{:<34}".format(result["name"]) + "".join("{:>17.4f}".format(result["seconds"][phase]) for phase in PHASES)
+              + "{:>12.1f}".format(result["total_peak_bytes"] / 2**20))
+
+    if options.baseline is not None:
+        with open(options.baseline) as file:
+            regressions: List[Dict] = compare(report, json.load(file), options.tolerance)
+
+        for regression in regressions:
+            print("REGRESSION {name} / {phase}: {baseline:.4f} s -> {seconds:.4f} s ({ratio:.2f}x)".format(**regression))
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
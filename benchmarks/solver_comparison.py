@@ -0,0 +1,64 @@
+#Compares the native Dormand-Prince solver in `src.model` against the nashpy (`scipy.integrate.odeint`) path.
+#Accuracy is measured against a tight-tolerance DOP853 reference solution.
+#Run from the repository root with: python -m benchmarks.solver_comparison
+
+import time
+import numpy as np
+
+from scipy.integrate import solve_ivp
+from typing import Dict, List, Tuple
+
+from src.model import Model, replicator_mutator_derivative, uniform_mutation_matrix
+
+
+def reference_solution(game_matrix: np.ndarray, initial_population: np.ndarray, timepoints: np.ndarray, mutation_matrix: np.ndarray) -> np.ndarray:
+    solution = solve_ivp(lambda t, y: replicator_mutator_derivative(y, game_matrix, mutation_matrix),
+                         (timepoints[0], timepoints[-1]), initial_population, method="DOP853",
+                         t_eval=timepoints, rtol=1e-13, atol=1e-14)
+    return solution.y.T
+
+
+def scenarios(seed: int = 0) -> List[Tuple[str, np.ndarray, np.ndarray, np.ndarray, float]]:
+    rng = np.random.default_rng(seed)
+
+    initial_population: np.ndarray = rng.random(16)
+    initial_population /= initial_population.sum()
+
+    game_matrix: np.ndarray = rng.random((16, 16))
+    mutation_matrix: np.ndarray = uniform_mutation_matrix(16, 0.01)
+
+    return [("16 types, horizon 1", game_matrix, initial_population, mutation_matrix, 1.0),
+            ("16 types, horizon 100", game_matrix, initial_population, mutation_matrix, 100.0),
+            ("16 types, stiff payoffs, horizon 10", 100 * game_matrix, initial_population, mutation_matrix, 10.0)]
+
+
+def run(sampling_frequency: int = 10000, repeats: int = 3) -> List[Dict]:
+    results: List[Dict] = []
+
+    for name, game_matrix, initial_population, mutation_matrix, horizon in scenarios():
+        timepoints: np.ndarray = np.linspace(0, horizon, sampling_frequency)
+        reference: np.ndarray = reference_solution(game_matrix, initial_population, timepoints, mutation_matrix)
+
+        for solver in ("nashpy", "native"):
+            times: List[float] = []
+
+            for _ in range(repeats):
+                start: float = time.perf_counter()
+                model = Model(game_matrix, initial_population, sampling_frequency, mutation_matrix,
+                              lazy=True, solver=solver, horizon=horizon)
+                trajectory: np.ndarray = model.replicator_dynamics
+                times.append(time.perf_counter() - start)
+
+            results.append({"scenario": name,
+                            "solver": solver,
+                            "seconds": min(times),
+                            "max_error": float(np.max(np.abs(trajectory - reference))),
+                            "max_simplex_drift": float(np.max(np.abs(trajectory.sum(axis=1) - 1)))})
+
+    return results
+
+
+if __name__ == "__main__":
+    print("{:<38}{:<8}{:>12}{:>14}{:>16}".format("scenario", "solver", "seconds", "max error", "simplex drift"))
+    for result in run():
+        print("{scenario:<38}{solver:<8}{seconds:>12.4f}{max_error:>14.2e}{max_simplex_drift:>16.2e}".format(**result))
@@ -1,2 +1,32 @@
-from .model import Model
-from .visualizer import Visualizer
\ No newline at end of file
+import importlib
+
+from typing import Dict, List, Any
+
+#Public names and the submodule defining each. Submodules are imported on first use, so importing `src.model` (for example
+#on a compute-only worker) does not load matplotlib through `src.visualizer`.
+_EXPORTS: Dict[str, str] = {"Model": "model",
+                            "solve_replicator_dynamics": "model",
+                            "ModelEnsemble": "ensemble",
+                            "ParameterSweep": "sweep",
+                            "TrajectoryStream": "stream",
+                            "StochasticEnsemble": "stochastic",
+                            "ResultCache": "cache",
+                            "EquilibriumAnalysis": "equilibria",
+                            "RestPointAnalysis": "stability",
+                            "Profiler": "profiling",
+                            "Visualizer": "visualizer",
+                            "render_batch": "visualizer"}
+
+__all__: List[str] = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value: Any = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + __all__)
\ No newline at end of file
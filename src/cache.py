@@ -0,0 +1,151 @@
+import os
+import json
+import uuid
+import hashlib
+import numpy as np
+
+from scipy import sparse
+from typing import Optional, List, Tuple, Dict, Any
+
+class ResultCache:
+
+    #On-disk cache of integrated trajectories, keyed by a hash of everything that determines a run.
+    #Each entry is a `<key>.npy` file, so a hit is served as a read-only memmap without copying, plus a `<key>.json` sidecar.
+    #Files are written under a temporary name and renamed into place, and eviction tolerates entries vanishing underneath it,
+    #so several processes can share one directory without locking. Least recently used entries (by file mtime, refreshed on
+    #every hit) are evicted once the directory grows past `max_bytes`.
+    def __init__(self, directory: str, max_bytes: Optional[int] = 2**30) -> None:
+
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("`max_bytes` must either be a positive integer or `None`.")
+
+        self._directory: str = directory
+        self._max_bytes: Optional[int] = max_bytes
+        self._hits: int = 0
+        self._misses: int = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(arrays: List[Optional[np.ndarray]], settings: Dict[str, Any]) -> str:
+
+        #Content hash of the arrays (dtype, shape and values) and of the JSON-serializable settings.
+        digest = hashlib.sha256()
+        for array in arrays:
+            if array is None:
+                digest.update(b"none")
+                continue
+            if sparse.issparse(array):
+                #Sparse matrices are hashed through their canonical CSR components.
+                array = sparse.csr_array(array)
+                array.sum_duplicates()
+                array.sort_indices()
+                digest.update(b"sparse" + str(array.shape).encode())
+                for component in (array.data, array.indices, array.indptr):
+                    digest.update(np.ascontiguousarray(component).tobytes())
+                continue
+            array = np.ascontiguousarray(array)
+            digest.update(array.dtype.str.encode())
+            digest.update(str(array.shape).encode())
+            digest.update(array.tobytes())
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @property
+    def max_bytes(self) -> Optional[int]:
+        return self._max_bytes
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def __path(self, key: str, extension: str) -> str:
+        return os.path.join(self._directory, key + extension)
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+
+        #Returns (trajectory as a read-only memmap, metadata) on a hit, `None` on a miss.
+        try:
+            with open(self.__path(key, ".json")) as file:
+                metadata: Dict[str, Any] = json.load(file)
+            trajectory: np.ndarray = np.load(self.__path(key, ".npy"), mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            self._misses += 1
+            return None
+
+        #Refresh the entry's position in the LRU order.
+        try:
+            os.utime(self.__path(key, ".npy"))
+        except OSError:
+            pass
+
+        self._hits += 1
+        return (trajectory, metadata)
+
+    def put(self, key: str, trajectory: np.ndarray, metadata: Optional[Dict[str, Any]] = None) -> None:
+
+        #The sidecar goes in first and the trajectory last, so an entry is only visible once it is complete.
+        for extension, write in ((".json", lambda file: json.dump({} if metadata is None else metadata, file)),
+                                 (".npy", lambda file: np.save(file, trajectory))):
+            temporary: str = self.__path(".{}-{}".format(key, uuid.uuid4().hex), extension)
+            with open(temporary, "w" if extension == ".json" else "wb") as file:
+                write(file)
+            try:
+                os.replace(temporary, self.__path(key, extension))
+            except OSError:
+                #Another process holds (and therefore has already written) this entry.
+                os.remove(temporary)
+
+        self.evict()
+
+    def evict(self) -> None:
+
+        #Deletes least recently used entries until the cache fits in `max_bytes`.
+        if self._max_bytes is None:
+            return
+
+        #Files are grouped into entries by key, so a trajectory and its sidecar are counted and evicted together and
+        #a sidecar whose trajectory is gone is evicted as an entry of its own. An entry is as recent as its newest file.
+        entries: Dict[str, Tuple[float, int]] = {}
+        for name in os.listdir(self._directory):
+            key, extension = os.path.splitext(name)
+            if extension not in (".npy", ".json") or name.startswith("."):
+                continue
+            try:
+                stat = os.stat(os.path.join(self._directory, name))
+            except FileNotFoundError:
+                continue
+            mtime, size = entries.get(key, (stat.st_mtime, 0))
+            entries[key] = (max(mtime, stat.st_mtime), size + stat.st_size)
+
+        total: int = sum(size for _, size in entries.values())
+        for _, size, key in sorted((mtime, size, key) for key, (mtime, size) in entries.items()):
+            if total <= self._max_bytes:
+                break
+            try:
+                #The trajectory goes first, so an entry that cannot be deleted yet is left whole.
+                for extension in (".npy", ".json"):
+                    try:
+                        os.remove(self.__path(key, extension))
+                    except FileNotFoundError:
+                        pass
+            except OSError:
+                #Still mapped by a reader on platforms that forbid deleting open files; try again on a later eviction.
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        for name in os.listdir(self._directory):
+            if name.endswith(".npy") or name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self._directory, name))
+                except OSError:
+                    pass
@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import uuid
+import shutil
+import argparse
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Tuple, Dict, Any
+
+#Batch runner for scenario files. Run from the repository root with:
+#    python -m src scenarios/ --output results/ [--workers N] [--no-plots] [--force]
+#
+#A scenario file is a JSON object, or a list of them, with these keys:
+#    name                 directory name under the output directory (default: the file name, plus an index for lists)
+#    game_matrix          nested list, or a path to a `.npy`, `.csv` or (sparse) `.npz` file, relative to the scenario file
+#    initial_population   list or path, as above
+#    mutation_matrix      list, path or null (optional)
+#    sampling_frequency   number of samples (default 1000)
+#    solver, horizon, rtol, atol, convergence_tolerance, convergence_window, max_horizon
+#                         passed on to `Model` (optional)
+#    plots                `Visualizer` plots to render, e.g. ["percentage_plot", "fitness_plot"] (optional)
+#    line_labels, line_colors
+#                         lists, or the name of a list in `src.config` such as "brief_monster_labels_16" (optional)
+#    visualizer           further `Visualizer` keyword arguments (optional)
+#
+#Each scenario writes `trajectory.npy`, any plots and finally `summary.json` to a temporary directory that is renamed to
+#its own directory once it has finished, so a failed scenario leaves nothing behind. Scenarios whose `summary.json` already
+#exists are skipped. matplotlib is only imported by workers that render plots.
+
+_MODEL_SETTINGS: List[str] = ["solver", "horizon", "rtol", "atol", "convergence_tolerance", "convergence_window", "max_horizon"]
+_SUMMARY_FILE: str = "summary.json"
+
+
+def _load_array(value: Any, directory: str) -> Any:
+
+    #A nested list, or a path to a `.npy`, `.csv` or sparse `.npz` file relative to the scenario file's directory.
+    if value is None or not isinstance(value, str):
+        return None if value is None else np.asarray(value, dtype=float)
+
+    path: str = os.path.join(directory, value)
+    extension: str = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        return np.load(path)
+    if extension == ".csv":
+        return np.loadtxt(path, delimiter=",", ndmin=1)
+    if extension == ".npz":
+        from scipy import sparse
+        return sparse.load_npz(path)
+    raise ValueError("Arrays must be given inline or as \".npy\", \".csv\" or \".npz\" files, not `{}`.".format(value))
+
+
+def _config_list(value: Any) -> Any:
+    if isinstance(value, str):
+        from . import config
+        return getattr(config, value)
+    return value
+
+
+def load_scenarios(paths: List[str]) -> List[Dict[str, Any]]:
+
+    #Reads every scenario from the given files and directories (every `.json` file in a directory, in name order).
+    #Each scenario gets a `directory` entry used to resolve its relative paths.
+    files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".json"))
+        else:
+            files.append(path)
+
+    scenarios: List[Dict[str, Any]] = []
+    for file_path in files:
+        with open(file_path) as file:
+            content: Any = json.load(file)
+
+        stem: str = os.path.splitext(os.path.basename(file_path))[0]
+        entries: List[Dict[str, Any]] = content if isinstance(content, list) else [content]
+        for index, entry in enumerate(entries):
+            scenario: Dict[str, Any] = dict(entry)
+            scenario.setdefault("name", stem if len(entries) == 1 else "{}_{}".format(stem, index))
+            scenario["directory"] = os.path.dirname(os.path.abspath(file_path))
+            scenarios.append(scenario)
+
+    names: List[str] = [scenario["name"] for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError("Scenario names must be unique.")
+    return scenarios
+
+
+def _write_json(path: str, content: Dict[str, Any]) -> None:
+
+    #Written under a temporary name and renamed, so a summary only exists once the scenario has finished.
+    temporary: str = "{}.{}.tmp".format(path, uuid.uuid4().hex)
+    with open(temporary, "w") as file:
+        json.dump(content, file, indent=2)
+    os.replace(temporary, path)
+
+
+def run_scenario(scenario: Dict[str, Any], output_directory: str, plots: Optional[bool] = True) -> Tuple[str, str]:
+
+    #Runs one scenario and returns (name, "done" | "skipped" | "failed: <reason>").
+    from .model import Model
+
+    name: str = scenario["name"]
+    directory: str = os.path.join(output_directory, name)
+    if os.path.exists(os.path.join(directory, _SUMMARY_FILE)):
+        return (name, "skipped")
+
+    #Results are written next to their final place, so the rename stays on one file system.
+    temporary: str = os.path.join(output_directory, ".{}.{}.tmp".format(name, uuid.uuid4().hex))
+
+    try:
+        game_matrix: Any = _load_array(scenario["game_matrix"], scenario["directory"])
+        initial_population: np.ndarray = np.asarray(_load_array(scenario["initial_population"], scenario["directory"])).ravel()
+        mutation_matrix: Any = _load_array(scenario.get("mutation_matrix"), scenario["directory"])
+        settings: Dict[str, Any] = {key: scenario[key] for key in _MODEL_SETTINGS if key in scenario}
+
+        model = Model(game_matrix, initial_population, int(scenario.get("sampling_frequency", 1000)), mutation_matrix,
+                      lazy=True, profile=True, **settings)
+
+        os.makedirs(temporary)
+        np.save(os.path.join(temporary, "trajectory.npy"), model.replicator_dynamics)
+
+        written: List[str] = []
+        if plots and scenario.get("plots"):
+            from .visualizer import Visualizer, BATCH_PLOTS
+
+            visualizer_kwargs: Dict[str, Any] = {key: tuple(value) if isinstance(value, list) and key != "plot_only" else value
+                                                 for key, value in scenario.get("visualizer", {}).items()}
+            for key in ("line_labels", "line_colors"):
+                if key in scenario:
+                    visualizer_kwargs[key] = list(_config_list(scenario[key]))
+
+            visualizer = Visualizer(model, **visualizer_kwargs)
+            for plot in scenario["plots"]:
+                if plot not in BATCH_PLOTS:
+                    raise ValueError("`plots` must be a subset of {}.".format(BATCH_PLOTS))
+                path: str = os.path.join(temporary, "{}.png".format(plot))
+                getattr(visualizer, plot)(save_to=path)
+                written.append(os.path.basename(path))
+
+        minima, maxima = model.population_percentage_extrema
+        _write_json(os.path.join(temporary, _SUMMARY_FILE),
+                    {"name": name,
+                     "dimension": model.dimension,
+                     "sampling_frequency": model.sampling_frequency,
+                     "horizon": model.horizon,
+                     "stop_reason": model.stop_reason,
+                     "convergence_time": None if model.convergence_time is None or np.isnan(model.convergence_time) else model.convergence_time,
+                     "final_population_percentages": model.final_population_percentages.tolist(),
+                     "final_population_derivatives": model.final_population_derivatives.tolist(),
+                     "population_percentage_extrema": [float(minima), float(maxima)],
+                     "plots": written,
+                     "timings": model.timings})
+
+        #Results left by an earlier run (without a summary, or removed by `--force`) are replaced as a whole.
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.rename(temporary, directory)
+    except Exception as error:
+        shutil.rmtree(temporary, ignore_errors=True)
+        return (name, "failed: {}: {}".format(type(error).__name__, error))
+
+    return (name, "done")
+
+
+def _run_scenario_task(arguments: Tuple[Dict[str, Any], str, bool]) -> Tuple[str, str]:
+    return run_scenario(*arguments)
+
+
+def run_batch(scenarios: List[Dict[str, Any]], output_directory: str, workers: Optional[int] = None, plots: Optional[bool] = True,
+              force: Optional[bool] = False) -> List[Tuple[str, str]]:
+
+    #Runs every scenario in `workers` processes (all cores if `None`, in this process if 1) and returns (name, status) pairs
+    #in completion order. With `force`, existing summaries are removed first so every scenario runs again.
+    os.makedirs(output_directory, exist_ok=True)
+    if force:
+        for scenario in scenarios:
+            summary: str = os.path.join(output_directory, scenario["name"], _SUMMARY_FILE)
+            if os.path.exists(summary):
+                os.remove(summary)
+
+    tasks: List[Tuple[Dict[str, Any], str, bool]] = [(scenario, output_directory, plots) for scenario in scenarios]
+    statuses: List[Tuple[str, str]] = []
+
+    if workers == 1:
+        for task in tasks:
+            statuses.append(_run_scenario_task(task))
+            print("{}: {}".format(*statuses[-1]), file=sys.stderr)
+    elif tasks:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for status in executor.map(_run_scenario_task, tasks):
+                statuses.append(status)
+                print("{}: {}".format(*status), file=sys.stderr)
+
+    return statuses
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src", description="Run replicator dynamics scenarios in batch.")
+    parser.add_argument("scenarios", nargs="+", help="Scenario JSON files, or directories of them.")
+    parser.add_argument("--output", "-o", required=True, help="Directory for the results, one subdirectory per scenario.")
+    parser.add_argument("--workers", "-j", type=int, default=None, help="Worker processes (default: all cores; 1 runs in this process).")
+    parser.add_argument("--no-plots", action="store_true", help="Skip rendering, so matplotlib is never imported.")
+    parser.add_argument("--force", action="store_true", help="Rerun scenarios that already have results.")
+    options = parser.parse_args(arguments)
+
+    statuses: List[Tuple[str, str]] = run_batch(load_scenarios(options.scenarios), options.output, options.workers,
+                                                not options.no_plots, options.force)
+
+    failed: List[str] = [name for name, status in statuses if status.startswith("failed")]
+    print("{} done, {} skipped, {} failed".format(sum(status == "done" for _, status in statuses),
+                                                  sum(status == "skipped" for _, status in statuses), len(failed)))
+    return 1 if failed else 0
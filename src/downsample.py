@@ -0,0 +1,67 @@
+import numpy as np
+
+from typing import Tuple
+
+#Display-aware decimation of (k, T) series sharing one time axis. Both methods keep the first and last samples and
+#return per-series (x, y) arrays of shape (k, m), since different series keep different samples.
+
+
+def minmax_downsample(x: np.ndarray, y: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+
+    #Splits the time axis into `buckets` equal buckets and keeps the minimum and maximum of every bucket, in time order,
+    #so spikes and extrema survive exactly. Returns at most 2 * buckets + 2 samples per series.
+    rows, length = y.shape
+    if length <= 2 * buckets + 2:
+        return (np.broadcast_to(x, y.shape), y)
+
+    size: int = -(-length // buckets)
+    buckets = -(-length // size)
+
+    #Pad with the last sample so every bucket has `size` samples; the padding can only repeat an existing extremum.
+    padded: np.ndarray = np.concatenate([y, np.repeat(y[:, -1:], buckets * size - length, axis=1)], axis=1).reshape(rows, buckets, size)
+    offsets: np.ndarray = np.arange(buckets) * size
+    minima: np.ndarray = np.minimum(padded.argmin(axis=2) + offsets, length - 1)
+    maxima: np.ndarray = np.minimum(padded.argmax(axis=2) + offsets, length - 1)
+
+    indices: np.ndarray = np.empty((rows, 2 * buckets + 2), dtype=int)
+    indices[:, 0] = 0
+    indices[:, 1:-1:2] = np.minimum(minima, maxima)
+    indices[:, 2:-1:2] = np.maximum(minima, maxima)
+    indices[:, -1] = length - 1
+
+    return (x[indices], np.take_along_axis(y, indices, axis=1))
+
+
+def lttb_downsample(x: np.ndarray, y: np.ndarray, samples: int) -> Tuple[np.ndarray, np.ndarray]:
+
+    #Largest-Triangle-Three-Buckets (Steinarsson, 2013): from each bucket keep the sample forming the largest triangle with
+    #the previously kept sample and the mean of the next bucket. Returns `samples` samples per series; the loop runs over
+    #buckets, with all series handled together.
+    rows, length = y.shape
+    if length <= samples or samples < 3:
+        return (np.broadcast_to(x, y.shape), y)
+
+    edges: np.ndarray = (np.linspace(1, length - 1, samples - 1)).astype(int)
+    indices: np.ndarray = np.empty((rows, samples), dtype=int)
+    indices[:, 0] = 0
+    indices[:, -1] = length - 1
+
+    row_range: np.ndarray = np.arange(rows)
+    previous: np.ndarray = np.zeros(rows, dtype=int)
+
+    for bucket in range(samples - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_start, next_stop = edges[bucket + 1], (edges[bucket + 2] if bucket + 2 < len(edges) else length)
+
+        mean_x: float = x[next_start:next_stop].mean()
+        mean_y: np.ndarray = y[:, next_start:next_stop].mean(axis=1)
+        previous_x: np.ndarray = x[previous]
+        previous_y: np.ndarray = y[row_range, previous]
+
+        #Twice the triangle area, for every candidate in the bucket and every series at once.
+        areas: np.ndarray = np.abs((previous_x[:, np.newaxis] - mean_x) * (y[:, start:stop] - previous_y[:, np.newaxis])
+                                   - (previous_x[:, np.newaxis] - x[start:stop]) * (mean_y - previous_y)[:, np.newaxis])
+        previous = start + areas.argmax(axis=1)
+        indices[:, bucket + 1] = previous
+
+    return (x[indices], np.take_along_axis(y, indices, axis=1))
@@ -0,0 +1,180 @@
+import numpy as np
+
+from .model import _dormand_prince_steps, _dense_output, _to_simplex, replicator_mutator_derivative
+from typing import Optional, Tuple, Any
+
+class ModelEnsemble:
+
+    def __error_check(self,
+                      game_matrix: Any,
+                      initial_populations: Any,
+                      sampling_frequency: Any,
+                      mutation_matrix: Any,
+                      horizon: Any,
+                      batch_size: Any
+        ) -> Tuple[bool, Exception]:
+
+        #Check input types:
+        if not isinstance(game_matrix, np.ndarray):
+            return (False, ValueError("`game_matrix` must be of type `numpy.ndarray`."))
+
+        if not isinstance(initial_populations, np.ndarray):
+            return (False, ValueError("`initial_populations` must be of type `numpy.ndarray`."))
+
+        if not isinstance(sampling_frequency, int):
+            return (False, ValueError("`sampling_frequency` must be of type `int`."))
+
+        if mutation_matrix is not None and not isinstance(mutation_matrix, np.ndarray):
+            return (False, ValueError("`mutation_matrix` must either be of type `np.ndarray` or `None`."))
+
+        if batch_size is not None and (not isinstance(batch_size, int) or batch_size <= 0):
+            return (False, ValueError("`batch_size` must either be a positive integer or `None`."))
+
+        #Sampling frequency and horizon must be positive:
+        if sampling_frequency < 2:
+            return (False, ValueError("`sampling_frequency` must be at least 2."))
+
+        if not isinstance(horizon, (int, float)) or horizon <= 0:
+            return (False, ValueError("`horizon` must be a positive number."))
+
+        #Check whether game_matrix dimensions agree:
+        game_num_of_rows, game_num_of_cols = game_matrix.shape
+
+        if game_num_of_rows != game_num_of_cols:
+            return (False, ValueError("`game_matrix` dimensions do not agree."))
+
+        #Initial populations are stacked as rows:
+        if initial_populations.ndim != 2 or initial_populations.shape[1] != game_num_of_rows:
+            return (False, ValueError("`initial_populations` must have shape (N, dimension)."))
+
+        if mutation_matrix is not None and mutation_matrix.shape != game_matrix.shape:
+            return (False, ValueError("`mutation_matrix` dimensions are not proper."))
+
+        return (True, None)
+
+    def __init__(self, game_matrix: np.ndarray,
+                 initial_populations: np.ndarray,
+                 sampling_frequency: Optional[int] = 2,
+                 mutation_matrix: Optional[np.ndarray] = None,
+                 horizon: Optional[float] = 1.0,
+                 rtol: Optional[float] = 1e-6,
+                 atol: Optional[float] = 1e-9,
+                 convergence_tolerance: Optional[float] = 1e-8,
+                 store_trajectories: Optional[bool] = False,
+                 batch_size: Optional[int] = None,
+                 run_checks: Optional[bool] = False
+    ) -> None:
+
+        if run_checks is True:
+            report = self.__error_check(game_matrix, initial_populations, sampling_frequency, mutation_matrix, horizon, batch_size)
+
+            if report[0] is False:
+                raise report[1]
+
+        #Initialize class properties;
+        self._game_matrix: np.ndarray = game_matrix
+        self._mutation_matrix: Optional[np.ndarray] = mutation_matrix
+        self._initial_populations: np.ndarray = initial_populations
+        self._size, self._dimension = initial_populations.shape
+        self._sampling_frequency: int = sampling_frequency
+        self._horizon: float = horizon
+        self._timepoints: np.ndarray = np.linspace(0, horizon, sampling_frequency)
+        self._convergence_tolerance: float = convergence_tolerance
+
+        #Every row of the ensemble is integrated together as one (N, d) state; `batch_size` bounds how many rows share a state,
+        #which bounds solver memory at roughly 10 * batch_size * d floats.
+        self._batch_size: int = self._size if batch_size is None else batch_size
+
+        self._final_populations: np.ndarray = np.empty((self._size, self._dimension))
+        self._final_population_derivatives: np.ndarray = np.empty((self._size, self._dimension))
+        self._convergence_times: np.ndarray = np.empty(self._size)
+        self._trajectories: Optional[np.ndarray] = None
+
+        if store_trajectories:
+            self._trajectories = np.empty((self._sampling_frequency, self._size, self._dimension))
+
+        for start in range(0, self._size, self._batch_size):
+            self.__integrate(slice(start, min(start + self._batch_size, self._size)), rtol, atol)
+
+    def __integrate(self, rows: slice, rtol: float, atol: float) -> None:
+
+        population: np.ndarray = _to_simplex(np.asarray(self._initial_populations[rows], dtype=float))
+        derivative: np.ndarray = replicator_mutator_derivative(population, self._game_matrix, self._mutation_matrix)
+
+        #A run has converged once its largest derivative stays below `convergence_tolerance`;
+        #`settled_since` is the first step end of the current quiet stretch, or `nan` while the run is still moving.
+        settled_since: np.ndarray = np.where(np.max(np.abs(derivative), axis=-1) < self._convergence_tolerance, self._timepoints[0], np.nan)
+
+        sample: int = 1
+        if self._trajectories is not None:
+            self._trajectories[0, rows] = population
+
+        for t_old, t_new, y_old, population, derivative, Q in _dormand_prince_steps(self._game_matrix, self._mutation_matrix, population,
+                                                                                     self._timepoints[0], self._timepoints[-1], rtol, atol):
+            active: np.ndarray = np.max(np.abs(derivative), axis=-1) >= self._convergence_tolerance
+            settled_since[active] = np.nan
+            settled_since[~active & np.isnan(settled_since)] = t_new
+
+            if self._trajectories is not None:
+                stop: int = int(np.searchsorted(self._timepoints, t_new, side="right"))
+                if stop > sample:
+                    self._trajectories[sample:stop, rows] = _dense_output(t_old, t_new, y_old, Q, self._timepoints[sample:stop])
+                    sample = stop
+
+        self._final_populations[rows] = population
+        self._final_population_derivatives[rows] = derivative
+        self._convergence_times[rows] = settled_since
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    @property
+    def sampling_frequency(self) -> int:
+        return self._sampling_frequency
+
+    @property
+    def horizon(self) -> float:
+        return self._horizon
+
+    @property
+    def timepoints(self) -> np.ndarray:
+        return self._timepoints
+
+    @property
+    def game_matrix(self) -> np.ndarray:
+        return self._game_matrix
+
+    @property
+    def mutation_matrix(self) -> Optional[np.ndarray]:
+        return self._mutation_matrix
+
+    @property
+    def initial_populations(self) -> np.ndarray:
+        return self._initial_populations
+
+    @property
+    def final_populations(self) -> np.ndarray:
+        return self._final_populations
+
+    @property
+    def final_population_derivatives(self) -> np.ndarray:
+        return self._final_population_derivatives
+
+    #Time from which each run's largest derivative stayed below `convergence_tolerance`; `nan` if it never settled within the horizon.
+    @property
+    def convergence_times(self) -> np.ndarray:
+        return self._convergence_times
+
+    @property
+    def converged(self) -> np.ndarray:
+        return ~np.isnan(self._convergence_times)
+
+    #Shape (sampling_frequency, N, dimension) when `store_trajectories` is set, otherwise `None`.
+    @property
+    def trajectories(self) -> Optional[np.ndarray]:
+        return self._trajectories
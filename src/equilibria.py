@@ -0,0 +1,219 @@
+import math
+import numpy as np
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from .cache import ResultCache
+from .model import Model, _dense
+from typing import Optional, List, Tuple, Iterator
+
+#Equilibria already computed in this process, keyed by a hash of the game matrix and the search settings. Only the
+#`_EQUILIBRIA_CACHE_SIZE` most recently used entries are kept, so analysing a long sweep does not grow a worker's memory.
+_EQUILIBRIA_CACHE_SIZE: int = 256
+_equilibria_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+
+def iterated_strict_dominance(game_matrix: np.ndarray) -> np.ndarray:
+
+    #Indices of the strategies that survive iterated elimination of strategies strictly dominated by a pure strategy.
+    #The game is symmetric, so a strategy removed for the row player is removed for the column player too.
+    surviving: np.ndarray = np.arange(game_matrix.shape[0])
+
+    while len(surviving) > 1:
+        payoffs: np.ndarray = game_matrix[np.ix_(surviving, surviving)]
+
+        #dominated[i, j] is True when strategy j earns strictly more than strategy i against every surviving opponent.
+        dominated: np.ndarray = np.all(payoffs[np.newaxis, :, :] > payoffs[:, np.newaxis, :], axis=2)
+        keep: np.ndarray = ~np.any(dominated, axis=1)
+
+        if np.all(keep):
+            break
+        surviving = surviving[keep]
+
+    return surviving
+
+
+def _support_chunks(dimension: int, max_support: int, chunk_size: int) -> Iterator[Tuple[int, int, int]]:
+
+    #Splits the supports of each size k into (k, first, count) chunks of at most `chunk_size` supports.
+    for k in range(1, max_support + 1):
+        total: int = math.comb(dimension, k)
+        for first in range(0, total, chunk_size):
+            yield (k, first, min(chunk_size, total - first))
+
+
+def _supports(dimension: int, k: int, first: int, count: int) -> np.ndarray:
+
+    #The `count` size-k subsets of range(dimension) starting at lexicographic rank `first`, as a (count, k) array.
+    #The first subset is unranked directly, so a chunk costs O(count) however deep into the order it starts.
+    support: List[int] = []
+    rank: int = first
+    candidate: int = 0
+    for position in range(k):
+        while math.comb(dimension - candidate - 1, k - position - 1) <= rank:
+            rank -= math.comb(dimension - candidate - 1, k - position - 1)
+            candidate += 1
+        support.append(candidate)
+        candidate += 1
+
+    supports: np.ndarray = np.empty((count, k), dtype=int)
+    for row in range(count):
+        supports[row] = support
+
+        #Advance to the next subset in lexicographic order.
+        position = k - 1
+        while position >= 0 and support[position] == dimension - k + position:
+            position -= 1
+        if position < 0:
+            break
+        support[position] += 1
+        for later in range(position + 1, k):
+            support[later] = support[later - 1] + 1
+
+    return supports
+
+
+def _equilibria_on_supports(game_matrix: np.ndarray, k: int, first: int, count: int, tolerance: float) -> np.ndarray:
+
+    #Symmetric equilibria x with support S solve A_SS x_S = v 1, sum(x_S) = 1, x_S > 0 and need (Ax)_j <= v off the support.
+    #All `count` supports of size k starting at position `first` are solved as one batch of (k + 1) x (k + 1) systems.
+    dimension: int = game_matrix.shape[0]
+    supports: np.ndarray = _supports(dimension, k, first, count)
+
+    systems: np.ndarray = np.zeros((count, k + 1, k + 1))
+    systems[:, :k, :k] = game_matrix[supports[:, :, np.newaxis], supports[:, np.newaxis, :]]
+    systems[:, :k, k] = -1
+    systems[:, k, :k] = 1
+    right_hand_side: np.ndarray = np.zeros((count, k + 1, 1))
+    right_hand_side[:, k] = 1
+
+    #Degenerate supports have singular systems; they are skipped, as in `nashpy`'s support enumeration.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        regular: np.ndarray = np.linalg.cond(systems) < 1 / tolerance
+    supports, systems, right_hand_side = supports[regular], systems[regular], right_hand_side[regular]
+    if len(supports) == 0:
+        return np.empty((0, dimension))
+
+    solutions: np.ndarray = np.linalg.solve(systems, right_hand_side)[:, :, 0]
+    weights, values = solutions[:, :k], solutions[:, k]
+
+    candidates: np.ndarray = np.zeros((len(supports), dimension))
+    np.put_along_axis(candidates, supports, weights, axis=1)
+
+    positive: np.ndarray = np.all(weights > tolerance, axis=1)
+    best_response: np.ndarray = np.all(candidates @ game_matrix.T <= values[:, np.newaxis] + tolerance, axis=1)
+    return candidates[positive & best_response]
+
+
+def _equilibria_on_supports_task(arguments: Tuple[np.ndarray, int, int, int, float]) -> np.ndarray:
+    return _equilibria_on_supports(*arguments)
+
+
+class EquilibriumAnalysis:
+
+    #Symmetric Nash equilibria of the symmetric game (A, A^T) behind the replicator dynamics; these are the rest points
+    #a replicator trajectory can settle on. Strictly dominated strategies are pruned first, then every support of the
+    #surviving strategies is checked in vectorized batches, optionally across worker processes.
+    def __init__(self, game_matrix: np.ndarray,
+                 max_support: Optional[int] = None,
+                 max_equilibria: Optional[int] = None,
+                 workers: Optional[int] = 1,
+                 chunk_size: Optional[int] = 4096,
+                 tolerance: Optional[float] = 1e-9
+    ) -> None:
+
+        if game_matrix.ndim != 2 or game_matrix.shape[0] != game_matrix.shape[1]:
+            raise ValueError("`game_matrix` must be a square `numpy.ndarray`.")
+
+        #Initialize class properties;
+        self._game_matrix: np.ndarray = game_matrix
+        self._dimension: int = game_matrix.shape[0]
+        self._max_support: Optional[int] = max_support
+        self._max_equilibria: Optional[int] = max_equilibria
+        self._workers: int = workers
+        self._chunk_size: int = chunk_size
+        self._tolerance: float = tolerance
+
+        self._surviving_strategies: np.ndarray = iterated_strict_dominance(game_matrix)
+        self._equilibria: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_model(cls, model: Model, **kwargs) -> "EquilibriumAnalysis":
+        #The support search indexes submatrices, so a sparse game matrix is densified.
+        return cls(_dense(model.game_matrix), **kwargs)
+
+    @property
+    def game_matrix(self) -> np.ndarray:
+        return self._game_matrix
+
+    @property
+    def surviving_strategies(self) -> np.ndarray:
+        return self._surviving_strategies
+
+    @property
+    def eliminated_strategies(self) -> np.ndarray:
+        return np.setdiff1d(np.arange(self._dimension), self._surviving_strategies)
+
+    #Shape (number of equilibria, dimension), ordered by support size; computed on first use.
+    @property
+    def equilibria(self) -> np.ndarray:
+        if self._equilibria is None:
+            key: str = ResultCache.key([self._game_matrix], {"max_support": self._max_support,
+                                                             "max_equilibria": self._max_equilibria,
+                                                             "tolerance": self._tolerance})
+            if key in _equilibria_cache:
+                _equilibria_cache.move_to_end(key)
+            else:
+                _equilibria_cache[key] = self.__enumerate()
+                while len(_equilibria_cache) > _EQUILIBRIA_CACHE_SIZE:
+                    _equilibria_cache.popitem(last=False)
+            self._equilibria = _equilibria_cache[key]
+        return self._equilibria
+
+    def __enumerate(self) -> np.ndarray:
+        reduced: np.ndarray = self._game_matrix[np.ix_(self._surviving_strategies, self._surviving_strategies)]
+        dimension: int = len(self._surviving_strategies)
+        max_support: int = dimension if self._max_support is None else min(self._max_support, dimension)
+
+        tasks: Iterator[Tuple[np.ndarray, int, int, int, float]] = ((reduced, k, first, count, self._tolerance)
+                                                                    for k, first, count in _support_chunks(dimension, max_support, self._chunk_size))
+        found: List[np.ndarray] = []
+        total: int = 0
+
+        def collect(batches: Iterator[np.ndarray]) -> None:
+            nonlocal total
+            for batch in batches:
+                found.append(batch)
+                total += len(batch)
+                #Early out once enough equilibria have been found; remaining tasks are abandoned.
+                if self._max_equilibria is not None and total >= self._max_equilibria:
+                    return
+
+        if self._workers == 1:
+            collect(map(_equilibria_on_supports_task, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                collect(executor.map(_equilibria_on_supports_task, tasks))
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        reduced_equilibria: np.ndarray = np.concatenate(found) if found else np.empty((0, dimension))
+        if self._max_equilibria is not None:
+            reduced_equilibria = reduced_equilibria[:self._max_equilibria]
+
+        #Map back to the full strategy space; eliminated strategies are never played.
+        equilibria: np.ndarray = np.zeros((len(reduced_equilibria), self._dimension))
+        equilibria[:, self._surviving_strategies] = reduced_equilibria
+        return equilibria
+
+    #Index of the equilibrium closest to `population` if it lies within `tolerance` (max norm), otherwise `None`.
+    def closest_equilibrium(self, population: np.ndarray, tolerance: Optional[float] = 1e-3) -> Optional[int]:
+        if len(self.equilibria) == 0:
+            return None
+
+        distances: np.ndarray = np.max(np.abs(self.equilibria - population), axis=1)
+        closest: int = int(np.argmin(distances))
+        return closest if distances[closest] <= tolerance else None
+
+    #Cross-checks which equilibrium the replicator trajectory of `model` ends at; `None` if it ends away from all of them.
+    def converged_equilibrium(self, model: Model, tolerance: Optional[float] = 1e-3) -> Optional[int]:
+        return self.closest_equilibrium(model.final_population_percentages, tolerance)
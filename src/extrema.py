@@ -0,0 +1,61 @@
+import numpy as np
+
+from typing import Optional, List, Tuple, Sequence
+
+class RangeExtrema:
+
+    #Range min/max index over the time axis of a (dimension, T) evolution array.
+    #Samples are grouped into blocks of `block_size`; a sparse table over the block minima and maxima answers any run of
+    #whole blocks in O(1), and the at most 2 * block_size samples at the ends of a window are scanned directly.
+    #Memory is about 2 * dimension * (T / block_size) * log2(T / block_size) floats.
+    def __init__(self, evolution: np.ndarray, block_size: Optional[int] = 64) -> None:
+
+        self._evolution: np.ndarray = evolution
+        self._block_size: int = block_size
+        self._dimension, self._length = evolution.shape
+
+        starts: np.ndarray = np.arange(0, self._length, block_size)
+        self._minima: List[np.ndarray] = [np.minimum.reduceat(evolution, starts, axis=1)]
+        self._maxima: List[np.ndarray] = [np.maximum.reduceat(evolution, starts, axis=1)]
+
+        #Level k holds the extrema of 2**k consecutive blocks starting at each block.
+        span: int = 1
+        while 2 * span <= len(starts):
+            self._minima.append(np.minimum(self._minima[-1][:, :-span], self._minima[-1][:, span:]))
+            self._maxima.append(np.maximum(self._maxima[-1][:, :-span], self._maxima[-1][:, span:]))
+            span *= 2
+
+    @property
+    def length(self) -> int:
+        return self._length
+
+    #Per-row (minima, maxima) over the samples [start, stop), restricted to `rows` if given.
+    def query(self, start: int, stop: int, rows: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+
+        #Plain ints, since numpy integers (e.g. from `np.searchsorted`) have no `bit_length`.
+        start, stop = max(int(start), 0), min(int(stop), self._length)
+        if start >= stop:
+            raise ValueError("The window must contain at least one sample.")
+
+        rows = slice(None) if rows is None else np.asarray(rows)
+
+        first_block: int = -(-start // self._block_size)
+        last_block: int = stop // self._block_size
+
+        #Windows without a whole block are scanned directly.
+        if first_block >= last_block:
+            window: np.ndarray = self._evolution[rows, start:stop]
+            return (window.min(axis=1), window.max(axis=1))
+
+        level: int = (last_block - first_block).bit_length() - 1
+        other: int = last_block - (1 << level)
+        minima: np.ndarray = np.minimum(self._minima[level][rows, first_block], self._minima[level][rows, other])
+        maxima: np.ndarray = np.maximum(self._maxima[level][rows, first_block], self._maxima[level][rows, other])
+
+        for edge_start, edge_stop in ((start, first_block * self._block_size), (last_block * self._block_size, stop)):
+            if edge_start < edge_stop:
+                edge: np.ndarray = self._evolution[rows, edge_start:edge_stop]
+                minima = np.minimum(minima, edge.min(axis=1))
+                maxima = np.maximum(maxima, edge.max(axis=1))
+
+        return (minima, maxima)
@@ -0,0 +1,102 @@
+import os
+import shutil
+import subprocess
+import numpy as np
+import matplotlib
+
+from PIL import Image, GifImagePlugin
+from matplotlib.colors import to_rgb
+from typing import Iterator, List
+
+#Streaming writers for rendered (height, width, 4) RGBA frames. Frames are consumed one at a time from an iterator,
+#so an export never holds the whole animation in memory.
+
+
+def write_frames(path: str, frames: Iterator[np.ndarray], fps: int, colors: List[str] = []) -> None:
+
+    #Picks the writer from the extension of `path`: ".gif", ".mp4" (needs ffmpeg) or a ".png" pattern such as "frame_%04d.png".
+    #`colors` lists colors that may appear only in later frames, so the GIF palette can include them.
+    extension: str = os.path.splitext(path)[1].lower()
+
+    if extension == ".gif":
+        _write_gif(path, frames, fps, colors)
+    elif extension == ".mp4":
+        _write_mp4(path, frames, fps)
+    elif extension == ".png":
+        _write_png_sequence(path, frames)
+    else:
+        raise ValueError("Animations can only be written to \".gif\", \".mp4\" or \".png\" (as a `%d` pattern) files.")
+
+
+def _write_gif(path: str, frames: Iterator[np.ndarray], fps: int, colors: List[str]) -> None:
+
+    first: np.ndarray = next(frames)
+
+    #One palette for the whole animation, built from the first frame plus the line colors, so frames are mapped onto it
+    #without being re-quantized from scratch. Pillow stores only the changed region of every later frame.
+    swatches: np.ndarray = np.repeat((np.array([to_rgb(color) for color in colors] or [(0, 0, 0)]) * 255).astype(np.uint8)[np.newaxis], 8, axis=0)
+    sample: np.ndarray = np.concatenate([first[:, :, :3], np.pad(swatches, ((0, 0), (0, first.shape[1] - swatches.shape[1]), (0, 0)), mode="edge")], axis=0)
+    palette: Image.Image = Image.fromarray(sample).quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+
+    def quantized(frame: np.ndarray) -> Image.Image:
+        return Image.fromarray(frame[:, :, :3]).quantize(palette=palette, dither=Image.Dither.NONE)
+
+    #Pillow's save_all keeps every appended frame alive until the file is closed, so the GIF is assembled here instead:
+    #the header once, then each frame's changed region as soon as it is rendered, holding only the previous frame.
+    duration: int = int(1000 / fps)
+    image: Image.Image = quantized(first)
+    header, _ = GifImagePlugin.getheader(image, info={"loop": 0, "duration": duration})
+
+    with open(path, "wb") as file:
+        file.write(b"".join(header))
+        file.write(b"".join(GifImagePlugin.getdata(image, duration=duration)))
+        previous: np.ndarray = np.asarray(image)
+
+        for frame in frames:
+            image = quantized(frame)
+            current: np.ndarray = np.asarray(image)
+            rows, columns = np.nonzero(current != previous)
+
+            #An unchanged frame still needs a (single pixel) entry so the animation keeps its timing.
+            box = (int(columns.min()), int(rows.min()), int(columns.max()) + 1, int(rows.max()) + 1) if rows.size else (0, 0, 1, 1)
+            file.write(b"".join(GifImagePlugin.getdata(image.crop(box), offset=box[:2], duration=duration)))
+            previous = current
+
+        file.write(b";")
+
+
+def _write_mp4(path: str, frames: Iterator[np.ndarray], fps: int) -> None:
+
+    ffmpeg: str = shutil.which(matplotlib.rcParams["animation.ffmpeg_path"])
+    if ffmpeg is None:
+        raise ValueError("Writing \".mp4\" animations needs ffmpeg, which was not found.")
+
+    first: np.ndarray = next(frames)
+    height, width = first.shape[:2]
+
+    #Raw frames are piped straight into the encoder; odd sizes are padded because yuv420p needs even dimensions.
+    command: List[str] = [ffmpeg, "-y", "-loglevel", "error",
+                          "-f", "rawvideo", "-pix_fmt", "rgba", "-s", "{}x{}".format(width, height), "-r", str(fps), "-i", "-",
+                          "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", path]
+
+    with subprocess.Popen(command, stdin=subprocess.PIPE) as process:
+        process.stdin.write(np.ascontiguousarray(first).tobytes())
+        for frame in frames:
+            process.stdin.write(np.ascontiguousarray(frame).tobytes())
+        process.stdin.close()
+
+        if process.wait() != 0:
+            raise RuntimeError("ffmpeg failed to write `{}`.".format(path))
+
+
+def _write_png_sequence(path: str, frames: Iterator[np.ndarray]) -> None:
+
+    if "%" not in path:
+        raise ValueError("PNG sequences need a numbered pattern such as \"frame_%04d.png\".")
+
+    directory: str = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    for index, frame in enumerate(frames):
+        Image.fromarray(frame).save(path % index, compress_level=1)
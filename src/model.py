@@ -1,6 +1,335 @@
+import json
 import numpy as np
-import nashpy as nash
-from typing import Optional, List, Tuple, Any
+from scipy import sparse
+from .cache import ResultCache
+from .extrema import RangeExtrema
+from .profiling import span
+from typing import Optional, List, Tuple, Dict, Iterator, Any, TYPE_CHECKING
+
+#nashpy is only imported once the "nashpy" solver or `Model.game` is used, so compute-only imports of this module stay light.
+if TYPE_CHECKING:
+    import nashpy as nash
+
+#Dormand-Prince 5(4) coefficients with Shampine's quartic dense output, as in `scipy.integrate.RK45`.
+_DP_C: np.ndarray = np.array([0, 1/5, 3/10, 4/5, 8/9, 1])
+_DP_A: List[np.ndarray] = [np.array([]),
+                           np.array([1/5]),
+                           np.array([3/40, 9/40]),
+                           np.array([44/45, -56/15, 32/9]),
+                           np.array([19372/6561, -25360/2187, 64448/6561, -212/729]),
+                           np.array([9017/3168, -355/33, 46732/5247, 49/176, -5103/18656])]
+_DP_B: np.ndarray = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])
+_DP_E: np.ndarray = np.array([-71/57600, 0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40])
+_DP_P: np.ndarray = np.array([[1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+                              [0, 0, 0, 0],
+                              [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+                              [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+                              [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+                              [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+                              [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+
+#Step size controller settings.
+_SAFETY: float = 0.9
+_MIN_FACTOR: float = 0.2
+_MAX_FACTOR: float = 10.0
+
+
+def _apply(matrix: Any, populations: np.ndarray) -> np.ndarray:
+
+    #`populations @ matrix.T` for populations of shape (d,) or (..., d). Sparse matrices are applied from the left,
+    #so the work scales with their nonzeros rather than with d^2.
+    if not sparse.issparse(matrix):
+        return populations @ matrix.T
+    flat: np.ndarray = populations.reshape(-1, populations.shape[-1])
+    return np.asarray(matrix @ flat.T).T.reshape(populations.shape)
+
+
+def _mutate(growth: np.ndarray, mutation_matrix: Any) -> np.ndarray:
+
+    #`growth @ mutation_matrix` for growth of shape (d,) or (..., d); `None` stands for the identity and skips the product.
+    if mutation_matrix is None:
+        return growth
+    return _apply(mutation_matrix.T, growth)
+
+
+def _dense(matrix: Any) -> np.ndarray:
+    return matrix.toarray() if sparse.issparse(matrix) else matrix
+
+
+def replicator_mutator_derivative(population: np.ndarray,
+                                  game_matrix: np.ndarray,
+                                  mutation_matrix: Optional[np.ndarray] = None
+) -> np.ndarray:
+
+    #x' = (x * Ax)Q - (x^T Ax)x for a population of shape (d,) or a stack of populations of shape (..., d).
+    #Both matrices may be dense or `scipy.sparse`; `None` stands for the identity mutation matrix.
+    #Theory for this calculation: https://nashpy.readthedocs.io/en/stable/text-book/replicator-dynamics.html#the-replicator-mutation-dynamics-equation
+    fitness: np.ndarray = _apply(game_matrix, population)
+    average_fitness: np.ndarray = np.sum(population * fitness, axis=-1, keepdims=True)
+    growth: np.ndarray = _mutate(fitness * population, mutation_matrix)
+
+    return growth - average_fitness * population
+
+
+def uniform_mutation_matrix(dimension: int, rate: float) -> np.ndarray:
+
+    #Each type stays with probability `1 - rate` and mutates into every other type with equal probability.
+    mutation_matrix: np.ndarray = np.full((dimension, dimension), rate / (dimension - 1))
+    np.fill_diagonal(mutation_matrix, 1 - rate)
+    return mutation_matrix
+
+
+def _to_simplex(population: np.ndarray) -> np.ndarray:
+
+    #Clip round-off below zero and rescale each population so that it sums to one.
+    population = np.maximum(population, 0)
+    return population / np.sum(population, axis=-1, keepdims=True)
+
+
+def _error_norm(error: np.ndarray, scale: np.ndarray) -> float:
+
+    #RMS norm over the strategies of each population, worst case over a stack of populations.
+    return float(np.max(np.sqrt(np.mean((error / scale) ** 2, axis=-1))))
+
+
+def _initial_step(game_matrix: np.ndarray,
+                  mutation_matrix: Optional[np.ndarray],
+                  y0: np.ndarray,
+                  f0: np.ndarray,
+                  interval_length: float,
+                  max_step: float,
+                  rtol: float,
+                  atol: float
+) -> float:
+
+    #Hairer, Norsett & Wanner, "Solving Ordinary Differential Equations I", Sec. II.4.
+    scale: np.ndarray = atol + np.abs(y0) * rtol
+    d0: float = _error_norm(y0, scale)
+    d1: float = _error_norm(f0, scale)
+    h0: float = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+    h0 = min(h0, interval_length)
+
+    f1: np.ndarray = replicator_mutator_derivative(y0 + h0 * f0, game_matrix, mutation_matrix)
+    d2: float = _error_norm(f1 - f0, scale) / h0
+
+    if d1 <= 1e-15 and d2 <= 1e-15:
+        h1: float = max(1e-6, h0 * 1e-3)
+    else:
+        h1 = (0.01 / max(d1, d2)) ** (1 / 5)
+
+    return min(100 * h0, h1, interval_length, max_step)
+
+
+def _dormand_prince_steps(game_matrix: np.ndarray,
+                          mutation_matrix: Optional[np.ndarray],
+                          initial_population: np.ndarray,
+                          t_start: float,
+                          t_end: float,
+                          rtol: float = 1e-6,
+                          atol: float = 1e-9,
+                          max_step: float = np.inf
+) -> Iterator[Tuple[float, float, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+
+    #Yields every accepted step as (t_old, t_new, y_old, y_new, f_new, Q), where `f_new` is the derivative at `y_new`
+    #and `y_old + h * theta_powers @ Q` is the dense output polynomial on [t_old, t_new].
+    #Accepted states are renormalised onto the simplex.
+    t: float = t_start
+    y: np.ndarray = _to_simplex(np.asarray(initial_population, dtype=float))
+    f: np.ndarray = replicator_mutator_derivative(y, game_matrix, mutation_matrix)
+
+    if t_end <= t_start:
+        return
+
+    h: float = _initial_step(game_matrix, mutation_matrix, y, f, t_end - t_start, max_step, rtol, atol)
+    K: np.ndarray = np.empty((7,) + y.shape)
+
+    while t < t_end:
+
+        min_step: float = 10 * np.abs(np.nextafter(t, np.inf) - t)
+        h = min(max(h, min_step), max_step)
+
+        step_accepted: bool = False
+        step_rejected: bool = False
+
+        while not step_accepted:
+
+            if h < min_step:
+                raise RuntimeError("Step size fell below the floating point resolution at t = {}.".format(t))
+
+            t_new: float = t + h
+            if t_new > t_end:
+                t_new = t_end
+            h = t_new - t
+
+            K[0] = f
+            for s in range(1, 6):
+                dy: np.ndarray = np.tensordot(_DP_A[s], K[:s], axes=1) * h
+                K[s] = replicator_mutator_derivative(y + dy, game_matrix, mutation_matrix)
+
+            #Each trial state is renormalised onto the simplex before its derivative is taken, so `f_new` is the derivative
+            #of the state actually carried forward; off-simplex drift would otherwise dominate it near a rest point.
+            y_new: np.ndarray = _to_simplex(y + h * np.tensordot(_DP_B, K[:6], axes=1))
+            f_new: np.ndarray = replicator_mutator_derivative(y_new, game_matrix, mutation_matrix)
+            K[6] = f_new
+
+            scale: np.ndarray = atol + np.maximum(np.abs(y), np.abs(y_new)) * rtol
+            error_norm: float = _error_norm(h * np.tensordot(_DP_E, K, axes=1), scale)
+
+            if error_norm < 1:
+                factor: float = _MAX_FACTOR if error_norm == 0 else min(_MAX_FACTOR, _SAFETY * error_norm ** (-1 / 5))
+                if step_rejected:
+                    factor = min(1, factor)
+                step_accepted = True
+            else:
+                factor = max(_MIN_FACTOR, _SAFETY * error_norm ** (-1 / 5))
+                step_rejected = True
+
+            h_next: float = h * factor
+
+            if not step_accepted:
+                h = h_next
+
+        Q: np.ndarray = np.tensordot(_DP_P.T, K, axes=1)
+        yield (t, t_new, y, y_new, f_new, Q)
+
+        t, y, f, h = t_new, y_new, f_new, h_next
+
+
+def _dense_output(t_old: float, t_new: float, y_old: np.ndarray, Q: np.ndarray, timepoints: np.ndarray) -> np.ndarray:
+
+    #Evaluates the dense output polynomial of one step at `timepoints`, returning shape (len(timepoints), ...).
+    h: float = t_new - t_old
+    theta: np.ndarray = (timepoints - t_old) / h
+    theta_powers: np.ndarray = np.cumprod(np.repeat(theta[:, np.newaxis], 4, axis=1), axis=1)
+    return _to_simplex(y_old + h * np.tensordot(theta_powers, Q, axes=1))
+
+
+def solve_replicator_dynamics(game_matrix: np.ndarray,
+                              initial_population: np.ndarray,
+                              timepoints: np.ndarray,
+                              mutation_matrix: Optional[np.ndarray] = None,
+                              rtol: Optional[float] = 1e-6,
+                              atol: Optional[float] = 1e-9,
+                              max_step: Optional[float] = np.inf
+) -> np.ndarray:
+
+    #Adaptive Dormand-Prince integration of the replicator-mutator equation, sampled at the (increasing) `timepoints`.
+    #`initial_population` may be a single population of shape (d,) or a stack of shape (..., d);
+    #the result has shape (len(timepoints),) + initial_population.shape.
+    initial_population = np.asarray(initial_population, dtype=float)
+    result: np.ndarray = np.empty((len(timepoints),) + initial_population.shape)
+
+    #Samples at (or before) the start time are the initial population itself.
+    start: int = int(np.searchsorted(timepoints, timepoints[0], side="right"))
+    result[:start] = _to_simplex(initial_population)
+
+    for t_old, t_new, y_old, y_new, _, Q in _dormand_prince_steps(game_matrix, mutation_matrix, initial_population,
+                                                               timepoints[0], timepoints[-1], rtol, atol, max_step):
+        stop: int = int(np.searchsorted(timepoints, t_new, side="right"))
+        if stop > start:
+            result[start:stop] = _dense_output(t_old, t_new, y_old, Q, timepoints[start:stop])
+            start = stop
+
+    return result
+
+
+def _sample_steps(initial_population: np.ndarray,
+                  steps: List[Tuple[float, float, np.ndarray, np.ndarray]],
+                  timepoints: np.ndarray
+) -> np.ndarray:
+
+    #Samples stored (t_old, t_new, y_old, Q) steps at the (increasing) `timepoints`, like `solve_replicator_dynamics`.
+    result: np.ndarray = np.empty((len(timepoints),) + np.shape(initial_population))
+    start: int = int(np.searchsorted(timepoints, timepoints[0], side="right"))
+    result[:start] = _to_simplex(np.asarray(initial_population, dtype=float))
+
+    for t_old, t_new, y_old, Q in steps:
+        stop: int = int(np.searchsorted(timepoints, t_new, side="right"))
+        if stop > start:
+            result[start:stop] = _dense_output(t_old, t_new, y_old, Q, timepoints[start:stop])
+            start = stop
+
+    #Round-off in the last step end can leave the final sample uncovered.
+    if start < len(timepoints):
+        t_old, t_new, y_old, Q = steps[-1]
+        result[start:] = _dense_output(t_old, t_new, y_old, Q, np.minimum(timepoints[start:], t_new))
+
+    return result
+
+
+def _integrate_to_steady_state(game_matrix: np.ndarray,
+                               initial_population: np.ndarray,
+                               mutation_matrix: Optional[np.ndarray],
+                               horizon: float,
+                               max_horizon: float,
+                               tolerance: float,
+                               window: float,
+                               rtol: float,
+                               atol: float
+) -> Tuple[List[Tuple[float, float, np.ndarray, np.ndarray]], float, float, str]:
+
+    #Integrates until the largest derivative has stayed below `tolerance` for `window` time units, or until `max_horizon`.
+    #Returns the accepted steps, the stopping time, the time the final quiet stretch began (`nan` if there was none)
+    #and the stop reason: "converged", "horizon" (no convergence by `horizon`) or "budget" (no convergence by an extended `max_horizon`).
+    steps: List[Tuple[float, float, np.ndarray, np.ndarray]] = []
+    initial_derivative: np.ndarray = replicator_mutator_derivative(_to_simplex(np.asarray(initial_population, dtype=float)),
+                                                                   game_matrix, mutation_matrix)
+    quiet_since: float = 0.0 if np.max(np.abs(initial_derivative)) < tolerance else np.nan
+    t_end: float = max(horizon, max_horizon)
+
+    for t_old, t_new, y_old, _, f_new, Q in _dormand_prince_steps(game_matrix, mutation_matrix, initial_population,
+                                                                  0.0, t_end, rtol, atol):
+        steps.append((t_old, t_new, y_old, Q))
+
+        if np.max(np.abs(f_new)) >= tolerance:
+            quiet_since = np.nan
+        elif np.isnan(quiet_since):
+            quiet_since = t_new
+
+        if not np.isnan(quiet_since) and t_new - quiet_since >= window:
+            return (steps, t_new, quiet_since, "converged")
+
+    return (steps, t_end, np.nan, "horizon" if t_end <= horizon else "budget")
+
+
+def _append(buffer: Optional[np.ndarray], current: np.ndarray, segment: np.ndarray, axis: int) -> Tuple[np.ndarray, np.ndarray]:
+
+    #Appends `segment` to `current` along `axis`, where `current` is a leading slice of `buffer` (or `buffer` is `None`).
+    #The buffer doubles whenever it runs out of room, so repeated appends cost amortised O(segment) instead of a full copy.
+    #Returns (buffer, view of the grown array).
+    length: int = current.shape[axis]
+    needed: int = length + segment.shape[axis]
+
+    if buffer is None or buffer.shape[axis] < needed:
+        shape: List[int] = list(current.shape)
+        shape[axis] = max(needed, 2 * length)
+        grown: np.ndarray = np.empty(shape, dtype=np.result_type(current, segment))
+        grown[(slice(None),) * axis + (slice(0, length),)] = current
+        buffer = grown
+
+    buffer[(slice(None),) * axis + (slice(length, needed),)] = segment
+    return (buffer, buffer[(slice(None),) * axis + (slice(0, needed),)])
+
+
+def _matrix_arrays(name: str, matrix: Any) -> Dict[str, np.ndarray]:
+
+    #Arrays storing a dense, sparse (as CSR components) or `None` matrix in an `.npz` file under `name`.
+    if matrix is None:
+        return {}
+    if sparse.issparse(matrix):
+        return {name + "_data": matrix.data, name + "_indices": matrix.indices, name + "_indptr": matrix.indptr,
+                name + "_shape": np.array(matrix.shape)}
+    return {name: matrix}
+
+
+def _matrix_from_arrays(name: str, arrays: Any) -> Any:
+    if name in arrays:
+        return arrays[name]
+    if name + "_data" in arrays:
+        return sparse.csr_array((arrays[name + "_data"], arrays[name + "_indices"], arrays[name + "_indptr"]),
+                                shape=tuple(arrays[name + "_shape"]))
+    return None
+
 
 class Model:
 
@@ -8,12 +337,16 @@ class Model:
                       game_matrix: Any,
                       initial_population: Any,
                       sampling_frequency: Any,
-                      mutation_matrix: Any               
+                      mutation_matrix: Any,
+                      solver: Any = None,
+                      horizon: Any = 1.0,
+                      convergence_tolerance: Any = None,
+                      max_horizon: Any = None
         ) -> Tuple[bool, Exception]:
         
         #Check input types:
-        if not isinstance(game_matrix, np.ndarray):
-            return (False, ValueError("`game_matrix` must be of type `numpy.ndarray`."))
+        if not isinstance(game_matrix, np.ndarray) and not sparse.issparse(game_matrix):
+            return (False, ValueError("`game_matrix` must be of type `numpy.ndarray` or a `scipy.sparse` matrix."))
 
         if not isinstance(initial_population, np.ndarray):
             return (False, ValueError("`initial_population` must be of type `numpy.ndarray`."))
@@ -21,29 +354,42 @@ class Model:
         if not isinstance(sampling_frequency, int):
             return (False, ValueError("`sampling_frequency` must be of type `int`."))
 
-        if not isinstance(mutation_matrix, np.ndarray) or mutation_matrix is not None:
-            return (False, ValueError("`mutation_matrix` must either be of type `np.ndarray` or `None`."))
+        if mutation_matrix is not None and not (isinstance(mutation_matrix, np.ndarray) or sparse.issparse(mutation_matrix)):
+            return (False, ValueError("`mutation_matrix` must either be of type `np.ndarray`, a `scipy.sparse` matrix or `None`."))
         
+        if solver not in (None, "nashpy", "native"):
+            return (False, ValueError("`solver` must either be \"nashpy\", \"native\" or `None`."))
+
+        if not isinstance(horizon, (int, float)) or horizon <= 0:
+            return (False, ValueError("`horizon` must be a positive number."))
+
+        if max_horizon is not None and (convergence_tolerance is None or max_horizon < horizon):
+            return (False, ValueError("`max_horizon` requires `convergence_tolerance` and must be at least `horizon`."))
+
         #Sampling frequency must be positive:
         if sampling_frequency < 0:
             return (False, ValueError("`sampling_frequency` must either be a positive integer."))
 
-        #Check whether game_matrix dimensions agree:
+        #Check whether game_matrix dimensions agree (`scipy.sparse` arrays may also be 1-D):
+        if game_matrix.ndim != 2:
+            return (False, ValueError("`game_matrix` must be 2-D."))
+
         game_num_of_rows, game_num_of_cols = game_matrix.shape
 
         if game_num_of_rows != game_num_of_cols:
             return (False, ValueError("`game_matrix` dimensions do not agree."))
 
-        #Check whether initial_pop dimensions agree with game_matrix dimensions and are proper:
-
-        pop_num_of_rows, pop_num_of_cols = initial_population.shape
+        #Check whether initial_pop dimensions agree with game_matrix dimensions and are proper (every solver needs shape (d,)):
 
-        if pop_num_of_rows != 1 or pop_num_of_cols != game_num_of_rows:
+        if initial_population.shape != (game_num_of_rows,):
             return (False, ValueError("`initial_pop` dimensions are not proper."))
 
         #If mutation_matrix is not None, check whether mutation_matrix dimensions agree with game_matrix:
 
         if mutation_matrix is not None:
+            if mutation_matrix.ndim != 2:
+                return (False, ValueError("`mutation_matrix` dimensions are not proper."))
+
             mut_num_of_rows, mut_num_of_cols = mutation_matrix.shape
 
             if mut_num_of_rows != mut_num_of_cols or mut_num_of_rows != game_num_of_rows or mut_num_of_cols != game_num_of_cols:
@@ -55,82 +401,137 @@ class Model:
                  initial_population: np.ndarray,
                  sampling_frequency: int,
                  mutation_matrix: Optional[np.ndarray] = None,
-                 run_checks: Optional[bool] = False
+                 run_checks: Optional[bool] = False,
+                 lazy: Optional[bool] = False,
+                 solver: Optional[str] = None,
+                 horizon: Optional[float] = 1.0,
+                 rtol: Optional[float] = 1e-6,
+                 atol: Optional[float] = 1e-9,
+                 convergence_tolerance: Optional[float] = None,
+                 convergence_window: Optional[float] = 0.1,
+                 max_horizon: Optional[float] = None,
+                 cache: Optional[ResultCache] = None,
+                 profile: Optional[bool] = False
     ) -> None:
 
         if run_checks is True:
-            report = self.__error_check(game_matrix,initial_population,sampling_frequency, mutation_matrix)
+            report = self.__error_check(game_matrix,initial_population,sampling_frequency, mutation_matrix, solver, horizon,
+                                        convergence_tolerance, max_horizon)
 
             if report[0] is False:
                 raise report[1]
 
         #Initialize class properties;
         self._sampling_frequency: int = sampling_frequency
-        self._timepoints: np.ndarray = np.linspace(0, 1, sampling_frequency)
+        self._horizon: float = horizon
+        self._timepoints: np.ndarray = np.linspace(0, horizon, sampling_frequency)
         self._dimension: int = game_matrix.shape[0]
         self._initial_population: np.ndarray = initial_population
-        self._game_matrix: np.ndarray = game_matrix
+        self._game_matrix: np.ndarray = sparse.csr_array(game_matrix) if sparse.issparse(game_matrix) else game_matrix
 
-        if mutation_matrix is None:
-            self._mutation_matrix = np.identity(self._dimension)
+        #The identity mutation matrix is kept as `None`, so that every product with it is skipped.
+        #Sparse matrices are stored as CSR, so integration and post-processing only touch their nonzeros.
+        if sparse.issparse(mutation_matrix):
+            mutation_matrix = sparse.csr_array(mutation_matrix)
+            identity: bool = mutation_matrix.nnz == self._dimension and (mutation_matrix != sparse.identity(self._dimension)).nnz == 0
         else:
-            self._mutation_matrix = mutation_matrix
-
-        self._game: nash.Game = nash.Game(self._game_matrix)
-        self._replicator_dynamics: np.ndarray = self._game.replicator_dynamics(y0 = self._initial_population,
-                                                    timepoints=self._timepoints,
-                                                    mutation_matrix=self._mutation_matrix)
-        
-        #No need to initialize these more than once;
-        freq_range: np.ndarray = np.arange(0, self._sampling_frequency)
-        dim_range: np.ndarray = np.arange(0, self._dimension)
-
-        #Needed for Visualization
-        self._population_evolution: List = [] 
-        self._derivative_evolution: List = []
-        self._fitness_evolution:    List = []
-        self._avg_fitness_evolution: List = []        
-
-        derivatives_matrix: List = []
-
-        fitness_matrix: List = []
-
-        for i in freq_range:
-            
-            #Calculate derivatives, fitness and average fitness 
-            #Theory for this calculation: https://nashpy.readthedocs.io/en/stable/text-book/replicator-dynamics.html#the-replicator-mutation-dynamics-equation
-            pop_vector: np.ndarray = self._replicator_dynamics[i]
-            fitness: np.ndarray  = game_matrix @ pop_vector
-            average_fitness: float = pop_vector.T @ fitness 
-
-            self._avg_fitness_evolution.append(average_fitness)
-            fitness_matrix.append(fitness)
-            derivatives_matrix.append((fitness * pop_vector) @ self._mutation_matrix -  average_fitness * pop_vector)
+            identity = mutation_matrix is None or np.array_equal(mutation_matrix, np.identity(self._dimension))
+        self._mutation_matrix: Optional[np.ndarray] = None if identity else mutation_matrix
+
+        #Solver settings; `rtol` and `atol` only apply to the native solver. Without an explicit `solver`, convergence-aware
+        #runs use the native solver and every other run uses nashpy.
+        if convergence_tolerance is not None and solver == "nashpy":
+            raise ValueError("`convergence_tolerance` requires the \"native\" solver.")
+
+        self._solver: str = solver if solver is not None else ("nashpy" if convergence_tolerance is None else "native")
+        self._rtol: float = rtol
+        self._atol: float = atol
+
+        #Convergence-aware runs (native solver only) stop once the largest derivative has stayed below `convergence_tolerance`
+        #for `convergence_window` time units, and keep going past `horizon` up to `max_horizon` if they have not converged by then.
+        #The stopping time becomes the horizon, so `horizon` and `timepoints` are only known after integration.
+        self._convergence_tolerance: Optional[float] = convergence_tolerance
+        self._convergence_window: float = convergence_window
+        self._max_horizon: float = horizon if max_horizon is None else max_horizon
+        self._convergence_time: Optional[float] = None
+        self._stop_reason: Optional[str] = None
+
+        if convergence_tolerance is not None:
+            self._timepoints = None
+
+        #Opt-in on-disk cache of the integrated trajectory, keyed by every input that determines it.
+        self._cache: Optional[ResultCache] = cache
+        self._cache_key: Optional[str] = None
+        self._run_settings: Dict[str, Any] = {"sampling_frequency": sampling_frequency,
+                                              "solver": self._solver,
+                                              "horizon": horizon,
+                                              "rtol": rtol,
+                                              "atol": atol,
+                                              "convergence_tolerance": convergence_tolerance,
+                                              "convergence_window": convergence_window,
+                                              "max_horizon": self._max_horizon}
+
+        #With `profile`, the seconds spent in every phase are accumulated in `timings`; see also `src.profiling.Profiler`.
+        self._timings: Optional[Dict[str, float]] = {} if profile else None
+
+        #Integration and every derived series are computed on first use and then memoized;
+        #`None` marks a quantity that has not been computed yet.
+        self._game: Optional["nash.Game"] = None
+        self._replicator_dynamics: Optional[np.ndarray] = None
+
+        #Needed for Visualization; stored as contiguous (dimension, sampling_frequency) arrays so that row i is the evolution of type i.
+        self._population_evolution: Optional[np.ndarray] = None
+        self._derivative_evolution: Optional[np.ndarray] = None
+        self._fitness_evolution:    Optional[np.ndarray] = None
+        self._avg_fitness_evolution: Optional[np.ndarray] = None
+
+        self._extrema: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._range_extrema: Dict[str, RangeExtrema] = {}
+
+        #Growable storage behind the trajectory and the derived series once the run has been extended, keyed by attribute name.
+        self._buffers: Dict[str, np.ndarray] = {}
+
+        #Without lazy evaluation everything is computed up front, as before.
+        if not lazy:
+            self.derivative_evolution
 
+    @property
+    def dimension(self) -> int:
+        return self._dimension
 
-        #Needed for Visualization
-        for i in dim_range:
+    @property
+    def sampling_frequency(self) -> int:
+        return self._sampling_frequency
 
-            type_i: List  = []
-            derivative_i: List  = []
-            fitness_i: List = []
+    @property
+    def horizon(self) -> float:
+        if self._timepoints is None:
+            self.replicator_dynamics
+        return self._horizon
 
-            for j in freq_range:
-                type_i.append(self._replicator_dynamics[j][i])
-                derivative_i.append(derivatives_matrix[j][i])
-                fitness_i.append(fitness_matrix[j][i])
+    @property
+    def timepoints(self) -> np.ndarray:
+        if self._timepoints is None:
+            self.replicator_dynamics
+        return self._timepoints
 
-            self._population_evolution.append(np.array(type_i))
-            self._derivative_evolution.append(np.array(derivative_i))
-            self._fitness_evolution.append(np.array(fitness_i))
+    #Time from which the run stayed below `convergence_tolerance`, `nan` if it never settled, `None` outside convergence-aware runs.
+    @property
+    def convergence_time(self) -> Optional[float]:
+        if self._convergence_tolerance is not None:
+            self.replicator_dynamics
+        return self._convergence_time
 
+    #"converged", "horizon" or "budget" for convergence-aware runs, otherwise `None`.
     @property
-    def dimension(self) -> int:
-        return self._dimension
+    def stop_reason(self) -> Optional[str]:
+        if self._convergence_tolerance is not None:
+            self.replicator_dynamics
+        return self._stop_reason
 
     @property
-    def sampling_frequency(self) -> int:
-        return self._sampling_frequency
+    def solver(self) -> str:
+        return self._solver
 
     @property
     def initial_population(self) -> np.ndarray:
@@ -142,64 +543,266 @@ class Model:
     
     @property
     def mutation_matrix(self) -> np.ndarray:
+        if self._mutation_matrix is None:
+            return sparse.identity(self._dimension, format="csr") if sparse.issparse(self._game_matrix) else np.identity(self._dimension)
         return self._mutation_matrix
     
+    #`nashpy` only works with dense matrices, so a sparse game matrix is expanded here.
     @property
-    def game(self) -> nash.Game:
+    def game(self) -> "nash.Game":
+        if self._game is None:
+            import nashpy as nash
+            self._game = nash.Game(_dense(self._game_matrix))
         return self._game
     
+    @property
+    def cache_key(self) -> str:
+        if self._cache_key is None:
+            self._cache_key = ResultCache.key([self._game_matrix, np.asarray(self._initial_population), self._mutation_matrix],
+                                              self._run_settings)
+        return self._cache_key
+
+    #Seconds spent per phase ("model.integration", "model.fitness_evolution", ...), including nested phases.
+    #Empty unless the model was built with `profile=True`.
+    @property
+    def timings(self) -> Dict[str, float]:
+        return {} if self._timings is None else dict(self._timings)
+
     @property
     def replicator_dynamics(self) -> np.ndarray:
+        if self._replicator_dynamics is None and self._cache is not None:
+            with span("model.cache", self._timings):
+                entry = self._cache.get(self.cache_key)
+
+            if entry is not None:
+                self._replicator_dynamics, metadata = entry
+                self._horizon = metadata["horizon"]
+                self._convergence_time = metadata["convergence_time"]
+                self._stop_reason = metadata["stop_reason"]
+                self._timepoints = np.linspace(0, self._horizon, self._sampling_frequency)
+            else:
+                self.__integrate()
+                self._cache.put(self.cache_key, self._replicator_dynamics, {"horizon": self._horizon,
+                                                                            "convergence_time": self._convergence_time,
+                                                                            "stop_reason": self._stop_reason})
+        elif self._replicator_dynamics is None:
+            self.__integrate()
+
         return self._replicator_dynamics
 
+    def __integrate(self) -> None:
+        with span("model.integration", self._timings):
+            self.__solve()
+
+    def __solve(self) -> None:
+        if self._convergence_tolerance is not None:
+            steps, self._horizon, self._convergence_time, self._stop_reason = _integrate_to_steady_state(
+                self._game_matrix, self._initial_population, self._mutation_matrix, self._horizon, self._max_horizon,
+                self._convergence_tolerance, self._convergence_window, self._rtol, self._atol)
+            self._timepoints = np.linspace(0, self._horizon, self._sampling_frequency)
+            self._replicator_dynamics = _sample_steps(self._initial_population, steps, self._timepoints)
+        elif self._solver == "native":
+            self._replicator_dynamics = solve_replicator_dynamics(self._game_matrix, self._initial_population, self._timepoints,
+                                                                  self._mutation_matrix, rtol=self._rtol, atol=self._atol)
+        else:
+            self._replicator_dynamics = self.game.replicator_dynamics(y0 = self._initial_population,
+                                                    timepoints=self._timepoints,
+                                                    mutation_matrix=_dense(self.mutation_matrix))
+
     @property
-    def population_evolution(self) -> List:
+    def population_evolution(self) -> np.ndarray:
+        if self._population_evolution is None:
+            replicator_dynamics: np.ndarray = self.replicator_dynamics
+            with span("model.population_evolution", self._timings):
+                self._population_evolution = np.ascontiguousarray(replicator_dynamics.T)
         return self._population_evolution
     
+    #Theory for these calculations: https://nashpy.readthedocs.io/en/stable/text-book/replicator-dynamics.html#the-replicator-mutation-dynamics-equation
+    #Column j of each evolution array is the state at timepoint j, so `game_matrix @ pop_vector` for every timepoint is `game_matrix @ population_evolution`.
     @property
-    def derivative_evolution(self) -> List:
+    def derivative_evolution(self) -> np.ndarray:
+        if self._derivative_evolution is None:
+            population: np.ndarray = self.population_evolution
+            fitness: np.ndarray = self.fitness_evolution
+            avg_fitness: np.ndarray = self.avg_fitness_evolution
+            with span("model.derivative_evolution", self._timings):
+                self._derivative_evolution = self.__mutate_columns(fitness * population) - avg_fitness * population
         return self._derivative_evolution
 
     @property
-    def avg_fitness_evolution(self) -> List:
+    def avg_fitness_evolution(self) -> np.ndarray:
+        if self._avg_fitness_evolution is None:
+            population: np.ndarray = self.population_evolution
+            fitness: np.ndarray = self.fitness_evolution
+            with span("model.avg_fitness_evolution", self._timings):
+                self._avg_fitness_evolution = np.einsum("ij,ij->j", population, fitness)
         return self._avg_fitness_evolution
 
     @property
-    def fitness_evolution(self) -> List:
+    def fitness_evolution(self) -> np.ndarray:
+        if self._fitness_evolution is None:
+            population: np.ndarray = self.population_evolution
+            with span("model.fitness_evolution", self._timings):
+                self._fitness_evolution = np.asarray(self._game_matrix @ population)
         return self._fitness_evolution
 
+    #`mutation_matrix^T @ series` for a (dimension, T) series; skipped for the identity.
+    def __mutate_columns(self, series: np.ndarray) -> np.ndarray:
+        if self._mutation_matrix is None:
+            return series
+        return np.asarray(self._mutation_matrix.T @ series)
+
     @property
     def final_population_percentages(self) -> np.ndarray:
-        return self._replicator_dynamics[self._sampling_frequency-1]
+        return self.replicator_dynamics[self._sampling_frequency-1]
 
     @property
-    def final_population_derivatives(self) -> List:
-        t = []
-        for i in range(self._dimension):
-            t.append(self._derivative_evolution[i][self._sampling_frequency-1])
-        return t
+    def final_population_derivatives(self) -> np.ndarray:
+        if self._derivative_evolution is not None:
+            return self._derivative_evolution[:, self._sampling_frequency-1]
+
+        #Only the final state is needed, so avoid building the whole derivative series.
+        pop_vector: np.ndarray = self.final_population_percentages
+        fitness: np.ndarray = _apply(self._game_matrix, pop_vector)
+        average_fitness: float = pop_vector.T @ fitness
+        return _mutate(fitness * pop_vector, self._mutation_matrix) - average_fitness * pop_vector
     
-    def __extrema(self, list):
-
-        min = list[0][0]
-        max = list[0][0]
-
-        for i in np.arange(0, self._dimension):
-            for j in np.arange(0, self._sampling_frequency):
-                min = min if min <= list[i][j] else list[i][j]
-                max = max if max >= list[i][j] else list[i][j]
-        
-        return (min, max)
+    def __evolution(self, series: str) -> np.ndarray:
+        if series == "population":
+            return self.population_evolution
+        if series == "derivative":
+            return self.derivative_evolution
+        if series == "fitness":
+            return self.fitness_evolution
+        raise ValueError("`series` must be one of \"population\", \"derivative\" or \"fitness\".")
+
+    #Per-type (minima, maxima) of a series, computed once in a single vectorized pass.
+    def __bounds(self, series: str) -> Tuple[np.ndarray, np.ndarray]:
+        if series not in self._extrema:
+            evolution: np.ndarray = self.__evolution(series)
+            with span("model.extrema", self._timings):
+                self._extrema[series] = (evolution.min(axis=1), evolution.max(axis=1))
+        return self._extrema[series]
+
+    def __extrema(self, series: str) -> Tuple[float, float]:
+        minima, maxima = self.__bounds(series)
+        return (minima.min(), maxima.max())
 
     @property
     def population_percentage_extrema(self) -> Tuple[float, float]:
-        return self.__extrema(self._replicator_dynamics)
+        return self.__extrema("population")
 
     @property    
     def population_derivative_extrema(self) -> Tuple[float, float]:
-        return self.__extrema(self._derivative_evolution)     
+        return self.__extrema("derivative")
     
     @property    
     def fitness_extrema(self) -> Tuple[float, float]:
-        return self.__extrema(self._fitness_evolution)     
-    
\ No newline at end of file
+        return self.__extrema("fitness")
+
+    @property
+    def population_percentage_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.__bounds("population")
+
+    @property
+    def population_derivative_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.__bounds("derivative")
+
+    @property
+    def fitness_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.__bounds("fitness")
+
+    #(min, max) of a series ("population", "derivative" or "fitness") over the time window [t0, t1],
+    #optionally restricted to the types in `strategies`. The range index behind it is built on first use.
+    def window_extrema(self, series: str, t0: float, t1: float, strategies: Optional[List[int]] = None) -> Tuple[float, float]:
+        if series not in self._range_extrema:
+            evolution: np.ndarray = self.__evolution(series)
+            with span("model.range_extrema", self._timings):
+                self._range_extrema[series] = RangeExtrema(evolution)
+
+        start: int = int(np.searchsorted(self.timepoints, t0, side="left"))
+        stop: int = int(np.searchsorted(self.timepoints, t1, side="right"))
+        minima, maxima = self._range_extrema[series].query(start, stop, strategies)
+        return (minima.min(), maxima.max())
+
+    def __solve_segment(self, population: np.ndarray, timepoints: np.ndarray) -> np.ndarray:
+        if self._solver == "native":
+            return solve_replicator_dynamics(self._game_matrix, population, timepoints, self._mutation_matrix,
+                                             rtol=self._rtol, atol=self._atol)
+        #The dynamics are autonomous, so the segment can be integrated on a grid starting at 0.
+        return self.game.replicator_dynamics(y0=population, timepoints=timepoints - timepoints[0], mutation_matrix=_dense(self.mutation_matrix))
+
+    #Continues the run from its final state up to time `until` with `samples` more timepoints (by default, as many as keep the
+    #current spacing). Only the new segment is integrated; it is appended to the trajectory and to every series computed so far,
+    #and cached extrema are updated from the segment alone. The window extrema index is rebuilt on its next use.
+    def extend(self, until: float, samples: Optional[int] = None) -> None:
+        trajectory: np.ndarray = self.replicator_dynamics
+        start: float = float(self._timepoints[-1])
+
+        if until <= start:
+            raise ValueError("`until` must be later than the current horizon.")
+
+        if samples is not None and (not isinstance(samples, (int, np.integer)) or samples <= 0):
+            raise ValueError("`samples` must be a positive integer.")
+
+        if samples is None:
+            spacing: float = (start - self._timepoints[0]) / (len(self._timepoints) - 1) if len(self._timepoints) > 1 else until - start
+            samples = max(1, int(round((until - start) / spacing)))
+
+        with span("model.extend", self._timings):
+            timepoints: np.ndarray = np.linspace(start, until, samples + 1)
+            segment: np.ndarray = self.__solve_segment(np.asarray(trajectory[-1]), timepoints)[1:]
+
+            population: np.ndarray = np.ascontiguousarray(segment.T)
+            fitness: np.ndarray = np.asarray(self._game_matrix @ population)
+            avg_fitness: np.ndarray = np.einsum("ij,ij->j", population, fitness)
+            derivative: np.ndarray = self.__mutate_columns(fitness * population) - avg_fitness * population
+
+            segments: Dict[str, Tuple[np.ndarray, int]] = {"_replicator_dynamics": (segment, 0),
+                                                           "_timepoints": (timepoints[1:], 0),
+                                                           "_population_evolution": (population, 1),
+                                                           "_fitness_evolution": (fitness, 1),
+                                                           "_avg_fitness_evolution": (avg_fitness, 0),
+                                                           "_derivative_evolution": (derivative, 1)}
+
+            for name, (values, axis) in segments.items():
+                current: Optional[np.ndarray] = getattr(self, name)
+                if current is not None:
+                    self._buffers[name], grown = _append(self._buffers.get(name), current, values, axis)
+                    setattr(self, name, grown)
+
+            for series, values in (("population", population), ("derivative", derivative), ("fitness", fitness)):
+                if series in self._extrema:
+                    minima, maxima = self._extrema[series]
+                    self._extrema[series] = (np.minimum(minima, values.min(axis=1)), np.maximum(maxima, values.max(axis=1)))
+            self._range_extrema.clear()
+
+        self._sampling_frequency += samples
+        self._horizon = until
+
+    #Writes the trajectory and everything needed to rebuild (and keep extending) this model to an `.npz` file.
+    def save_checkpoint(self, path: str) -> None:
+        settings: Dict[str, Any] = dict(self._run_settings, solver=self._solver, sampling_frequency=self._sampling_frequency,
+                                        horizon=self.horizon, convergence_time=self.convergence_time, stop_reason=self.stop_reason)
+        np.savez(path,
+                 replicator_dynamics=self.replicator_dynamics,
+                 timepoints=self.timepoints,
+                 initial_population=np.asarray(self._initial_population),
+                 settings=np.array(json.dumps(settings)),
+                 **_matrix_arrays("game_matrix", self._game_matrix),
+                 **_matrix_arrays("mutation_matrix", self._mutation_matrix))
+
+    #Rebuilds a model written by `save_checkpoint`, possibly in another process; `kwargs` (e.g. `cache` or `profile`) go to the constructor.
+    @classmethod
+    def load_checkpoint(cls, path: str, **kwargs) -> "Model":
+        with np.load(path) as checkpoint:
+            settings: Dict[str, Any] = json.loads(str(checkpoint["settings"]))
+            model: Model = cls(_matrix_from_arrays("game_matrix", checkpoint), checkpoint["initial_population"], settings["sampling_frequency"],
+                               _matrix_from_arrays("mutation_matrix", checkpoint), lazy=True, solver=settings["solver"], horizon=settings["horizon"],
+                               rtol=settings["rtol"], atol=settings["atol"], **kwargs)
+            model._replicator_dynamics = checkpoint["replicator_dynamics"]
+            model._timepoints = checkpoint["timepoints"]
+
+        model._convergence_time = settings["convergence_time"]
+        model._stop_reason = settings["stop_reason"]
+        return model
\ No newline at end of file
@@ -0,0 +1,139 @@
+import time
+import tracemalloc
+
+from typing import Optional, List, Dict, Callable, Any
+
+#Profilers currently collecting spans, innermost last, and the stack of open spans.
+_profilers: List["Profiler"] = []
+_open_spans: List["_Span"] = []
+
+
+class _NullSpan:
+
+    #Shared do-nothing span, handed out while nothing is collecting so an uninstrumented run pays one check per phase.
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NULL_SPAN: _NullSpan = _NullSpan()
+
+
+class _Span:
+
+    def __init__(self, name: str, timings: Optional[Dict[str, float]]) -> None:
+        self._name: str = name
+        self._timings: Optional[Dict[str, float]] = timings
+        self._profilers: List[Profiler] = list(_profilers)
+        self._memory: bool = any(profiler.memory for profiler in self._profilers) and tracemalloc.is_tracing()
+        self._child_seconds: float = 0.0
+        self._peak: int = 0
+
+    def __enter__(self) -> None:
+        self._parent: Optional[_Span] = _open_spans[-1] if _open_spans else None
+        _open_spans.append(self)
+
+        #tracemalloc keeps a single peak, so it is reset here and the peak seen so far is handed to the enclosing span.
+        if self._memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._parent is not None:
+                self._parent._peak = max(self._parent._peak, peak)
+            tracemalloc.reset_peak()
+            self._start_bytes: int = current
+
+        self._start: float = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        seconds: float = time.perf_counter() - self._start
+        _open_spans.pop()
+
+        record: Dict[str, Any] = {"name": self._name,
+                                  "parent": None if self._parent is None else self._parent._name,
+                                  "seconds": seconds,
+                                  "self_seconds": seconds - self._child_seconds}
+
+        if self._memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self._peak = max(self._peak, peak)
+            record["allocated_bytes"] = current - self._start_bytes
+            record["peak_bytes"] = self._peak - self._start_bytes
+            if self._parent is not None:
+                self._parent._peak = max(self._parent._peak, self._peak)
+            tracemalloc.reset_peak()
+
+        if self._parent is not None:
+            self._parent._child_seconds += seconds
+
+        if self._timings is not None:
+            self._timings[self._name] = self._timings.get(self._name, 0.0) + seconds
+
+        for profiler in self._profilers:
+            profiler._record(record)
+
+
+def span(name: str, timings: Optional[Dict[str, float]] = None):
+
+    #Context manager timing one phase. The time is added to `timings` (if given) and reported to every active `Profiler`;
+    #with neither, the shared null span is returned.
+    if timings is None and not _profilers:
+        return _NULL_SPAN
+    return _Span(name, timings)
+
+
+class Profiler:
+
+    #Collects the spans of every `Model` and `Visualizer` phase run inside its `with` block:
+    #
+    #    with Profiler(memory=True) as profiler:
+    #        Visualizer(Model(...)).percentage_plot(save_to="plot.png")
+    #    profiler.report
+    #
+    #With `memory=True` each span also records the bytes it left allocated and its peak allocation above its starting point,
+    #measured with `tracemalloc`, which slows the run down noticeably. `callback` receives every span record as it closes.
+    def __init__(self, memory: Optional[bool] = False, callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        self._memory: bool = memory
+        self._callback: Optional[Callable[[Dict[str, Any]], None]] = callback
+        self._spans: List[Dict[str, Any]] = []
+        self._started_tracing: bool = False
+
+    @property
+    def memory(self) -> bool:
+        return self._memory
+
+    #Every closed span in the order it closed, so children come before their parents.
+    @property
+    def spans(self) -> List[Dict[str, Any]]:
+        return self._spans
+
+    #Per span name: how often it ran, its total and self time, and (with `memory=True`) its largest peak allocation.
+    @property
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        report: Dict[str, Dict[str, Any]] = {}
+        for record in self._spans:
+            entry: Dict[str, Any] = report.setdefault(record["name"], {"count": 0, "seconds": 0.0, "self_seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += record["seconds"]
+            entry["self_seconds"] += record["self_seconds"]
+            if "peak_bytes" in record:
+                entry["peak_bytes"] = max(entry.get("peak_bytes", 0), record["peak_bytes"])
+        return report
+
+    def _record(self, record: Dict[str, Any]) -> None:
+        self._spans.append(record)
+        if self._callback is not None:
+            self._callback(record)
+
+    def __enter__(self) -> "Profiler":
+        if self._memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _profilers.append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _profilers.remove(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
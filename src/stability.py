@@ -0,0 +1,318 @@
+import numpy as np
+
+from .equilibria import _supports, _support_chunks
+from .model import Model, _dense
+from typing import Optional, List, Tuple, Dict
+
+
+def _stack_derivative(population: np.ndarray, game_matrix: np.ndarray, mutation_matrix: Optional[np.ndarray]) -> np.ndarray:
+
+    #x' = (x * Ax)Q - (x^T Ax)x where `game_matrix` and `mutation_matrix` may be stacks broadcasting against `population`.
+    fitness: np.ndarray = np.einsum("...ij,...j->...i", game_matrix, population)
+    average_fitness: np.ndarray = np.sum(population * fitness, axis=-1, keepdims=True)
+    growth: np.ndarray = fitness * population
+    if mutation_matrix is not None:
+        growth = np.einsum("...i,...ij->...j", growth, mutation_matrix)
+    return growth - average_fitness * population
+
+
+def _flow(population: np.ndarray, game_matrices: np.ndarray, mutation_matrix: Optional[np.ndarray], steps: int) -> np.ndarray:
+
+    #Follows the dynamics from a stack of populations with `steps` classical Runge-Kutta steps of size 1 / max|A|, so every
+    #matrix is integrated over a comparable number of its own time scales. The end states sit close to the attractors.
+    step_size: np.ndarray = 1 / np.maximum(np.max(np.abs(game_matrices), axis=(-2, -1))[..., np.newaxis], 1e-12)
+    for _ in range(steps):
+        k1: np.ndarray = _stack_derivative(population, game_matrices, mutation_matrix)
+        k2: np.ndarray = _stack_derivative(population + step_size / 2 * k1, game_matrices, mutation_matrix)
+        k3: np.ndarray = _stack_derivative(population + step_size / 2 * k2, game_matrices, mutation_matrix)
+        k4: np.ndarray = _stack_derivative(population + step_size * k3, game_matrices, mutation_matrix)
+        population = np.maximum(population + step_size / 6 * (k1 + 2 * k2 + 2 * k3 + k4), 0)
+        population /= population.sum(axis=-1, keepdims=True)
+    return population
+
+
+def replicator_mutator_jacobian(population: np.ndarray, game_matrix: np.ndarray, mutation_matrix: Optional[np.ndarray] = None) -> np.ndarray:
+
+    #Analytic Jacobian of x' = (x * Ax)Q - (x^T Ax)x, for populations of shape (..., d) and game and mutation matrices of
+    #shape (d, d) or stacks (..., d, d) broadcasting against them; `None` stands for the identity mutation matrix:
+    #    J = Q^T (diag(Ax) + diag(x) A) - x ((A + A^T) x)^T - (x^T Ax) I
+    fitness: np.ndarray = np.einsum("...ij,...j->...i", game_matrix, population)
+    average_fitness: np.ndarray = np.sum(population * fitness, axis=-1)
+    gradient: np.ndarray = fitness + np.einsum("...ji,...j->...i", game_matrix, population)
+
+    growth: np.ndarray = population[..., :, np.newaxis] * game_matrix
+    growth = growth + fitness[..., :, np.newaxis] * np.identity(population.shape[-1])
+    if mutation_matrix is not None:
+        growth = np.swapaxes(mutation_matrix, -1, -2) @ growth
+
+    return growth - population[..., :, np.newaxis] * gradient[..., np.newaxis, :] - average_fitness[..., np.newaxis, np.newaxis] * np.identity(population.shape[-1])
+
+
+def _tangent_basis(dimension: int) -> np.ndarray:
+
+    #Orthonormal basis (as columns) of the directions that stay on the simplex, {v : sum(v) = 0}.
+    basis, _ = np.linalg.qr(np.identity(dimension)[:, :-1] - 1 / dimension)
+    return basis
+
+
+def tangent_eigenvalues(jacobian: np.ndarray) -> np.ndarray:
+
+    #Eigenvalues of a stack of Jacobians (..., d, d) restricted to the simplex, shape (..., d - 1). The dynamics keep the
+    #simplex invariant, so the Jacobian maps the tangent space into itself and these are the eigenvalues that decide stability.
+    basis: np.ndarray = _tangent_basis(jacobian.shape[-1])
+    return np.linalg.eigvals(basis.T @ jacobian @ basis)
+
+
+def classify_stability(eigenvalues: np.ndarray, tolerance: Optional[float] = 1e-9) -> np.ndarray:
+
+    #"stable" (every real part negative), "unstable" (every real part positive), "saddle" (both signs) or
+    #"non-hyperbolic" (some real part within `tolerance` of 0 and none positive), for eigenvalues of shape (..., d - 1).
+    real: np.ndarray = np.real(eigenvalues)
+    negative: np.ndarray = np.all(real < -tolerance, axis=-1)
+    positive: np.ndarray = np.any(real > tolerance, axis=-1)
+    all_positive: np.ndarray = np.all(real > tolerance, axis=-1)
+
+    return np.where(negative, "stable",
+                    np.where(all_positive, "unstable",
+                             np.where(positive, "saddle", "non-hyperbolic")))
+
+
+class RestPointAnalysis:
+
+    #Rest points of the replicator(-mutator) dynamics and their linear stability, for one game or a whole stack of games.
+    #Without mutation every face of the simplex is searched: on the face with support S the rest point solves
+    #A_SS x_S = v 1, sum(x_S) = 1, x_S > 0, which is solved for every support of a given size and every matrix in one
+    #batched call, at most `chunk_size` systems at a time. Faces with a continuum of rest points (singular systems) are skipped.
+    #Mutation moves rest points off the faces, so they are found instead by a batched Newton search on the simplex, started
+    #from the barycentre, from `starts` random points and from where the dynamics carry those points after `flow_steps`
+    #integration steps, which puts a start next to every attractor the ensemble reaches. That search is not exhaustive:
+    #saddles and unstable rest points with no nearby start can be missed, and raising `starts` finds more of them.
+    #Every rest point is then classified from the eigenvalues of the analytic Jacobian restricted to the simplex.
+    def __init__(self, game_matrices: np.ndarray,
+                 mutation_matrix: Optional[np.ndarray] = None,
+                 max_support: Optional[int] = None,
+                 starts: Optional[int] = 32,
+                 seed: Optional[int] = 0,
+                 batch_size: Optional[int] = 1024,
+                 chunk_size: Optional[int] = 4096,
+                 flow_steps: Optional[int] = 200,
+                 tolerance: Optional[float] = 1e-9
+    ) -> None:
+
+        if game_matrices.ndim not in (2, 3) or game_matrices.shape[-1] != game_matrices.shape[-2]:
+            raise ValueError("`game_matrices` must be a square matrix or a stack of square matrices.")
+
+        #Initialize class properties;
+        self._game_matrices: np.ndarray = game_matrices[np.newaxis] if game_matrices.ndim == 2 else game_matrices
+        self._size, self._dimension = self._game_matrices.shape[:2]
+
+        #The identity mutation matrix (as stored by `Model`) is the same as no mutation, and allows the exact face search.
+        if mutation_matrix is not None and np.array_equal(mutation_matrix, np.broadcast_to(np.identity(self._dimension), mutation_matrix.shape)):
+            mutation_matrix = None
+        self._mutation_matrix: Optional[np.ndarray] = mutation_matrix
+
+        self._max_support: int = self._dimension if max_support is None else min(max_support, self._dimension)
+        self._starts: int = starts
+        self._seed: Optional[int] = seed
+        self._batch_size: int = batch_size
+        self._chunk_size: int = chunk_size
+        self._flow_steps: int = flow_steps
+        self._tolerance: float = tolerance
+
+        self._results: Optional[Dict[str, np.ndarray]] = None
+
+    @classmethod
+    def from_model(cls, model: Model, **kwargs) -> "RestPointAnalysis":
+        #Sparse matrices are densified for the batched solves; the identity mutation matrix is passed on as `None`.
+        mutation_matrix: Optional[np.ndarray] = None if model._mutation_matrix is None else _dense(model._mutation_matrix)
+        return cls(_dense(model.game_matrix), mutation_matrix, **kwargs)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    #Every rest point found, shape (number of rest points, dimension), grouped by matrix.
+    @property
+    def rest_points(self) -> np.ndarray:
+        return self.__results()["rest_points"]
+
+    #Index of the game matrix each rest point belongs to.
+    @property
+    def matrix_indices(self) -> np.ndarray:
+        return self.__results()["matrix_indices"]
+
+    #Shape (number of rest points, dimension, dimension).
+    @property
+    def jacobians(self) -> np.ndarray:
+        return self.__results()["jacobians"]
+
+    #Eigenvalues of each Jacobian restricted to the simplex, shape (number of rest points, dimension - 1).
+    @property
+    def eigenvalues(self) -> np.ndarray:
+        return self.__results()["eigenvalues"]
+
+    #"stable", "unstable", "saddle" or "non-hyperbolic" per rest point.
+    @property
+    def stability(self) -> np.ndarray:
+        return self.__results()["stability"]
+
+    #Whether each rest point is a symmetric Nash equilibrium (no strategy earns more than the population average).
+    @property
+    def nash(self) -> np.ndarray:
+        return self.__results()["nash"]
+
+    #Whether each rest point passes the ESS test (`None` with mutation, where ESS is not defined). Nash equilibria whose best
+    #replies are all in the support are tested exactly; otherwise the test requires x^T A z > z^T A z in every direction
+    #within the best replies, which is sufficient but stricter than needed.
+    @property
+    def ess(self) -> Optional[np.ndarray]:
+        return self.__results()["ess"]
+
+    #Rest points of the matrix at `index` as (rest points, stability).
+    def rest_points_of(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows: np.ndarray = self.matrix_indices == index
+        return (self.rest_points[rows], self.stability[rows])
+
+    #Rest point of the matrix at `index` closest to `population` (max norm) if within `tolerance`, as (rest point index, stability).
+    def classify_state(self, population: np.ndarray, index: Optional[int] = 0, tolerance: Optional[float] = 1e-3) -> Optional[Tuple[int, str]]:
+        rows: np.ndarray = np.flatnonzero(self.matrix_indices == index)
+        if len(rows) == 0:
+            return None
+
+        distances: np.ndarray = np.max(np.abs(self.rest_points[rows] - population), axis=1)
+        closest: int = int(rows[np.argmin(distances)])
+        return (closest, str(self.stability[closest])) if distances.min() <= tolerance else None
+
+    def __results(self) -> Dict[str, np.ndarray]:
+        if self._results is None:
+            found: List[Tuple[np.ndarray, np.ndarray]] = []
+            for start in range(0, self._size, self._batch_size):
+                rows: slice = slice(start, min(start + self._batch_size, self._size))
+                points, indices = self.__faces(rows) if self._mutation_matrix is None else self.__newton(rows)
+                found.append((points, indices + start))
+
+            points: np.ndarray = np.concatenate([points for points, _ in found])
+            indices: np.ndarray = np.concatenate([indices for _, indices in found])
+            order: np.ndarray = np.argsort(indices, kind="stable")
+            self._results = self.__classify(points[order], indices[order])
+        return self._results
+
+    def __mutation(self, rows: slice) -> Optional[np.ndarray]:
+        if self._mutation_matrix is None or self._mutation_matrix.ndim == 2:
+            return self._mutation_matrix
+        return self._mutation_matrix[rows]
+
+    def __faces(self, rows: slice) -> Tuple[np.ndarray, np.ndarray]:
+        game_matrices: np.ndarray = self._game_matrices[rows]
+        count: int = len(game_matrices)
+        points: List[np.ndarray] = []
+        indices: List[np.ndarray] = []
+
+        #Supports are taken in chunks so that one chunk holds at most `chunk_size` (matrix, support) systems.
+        for k, first, chunk in _support_chunks(self._dimension, self._max_support, max(1, self._chunk_size // count)):
+            supports: np.ndarray = _supports(self._dimension, k, first, chunk)
+
+            #One (k + 1) x (k + 1) system per (matrix, support) pair.
+            systems: np.ndarray = np.zeros((count, len(supports), k + 1, k + 1))
+            systems[:, :, :k, :k] = game_matrices[:, supports[:, :, np.newaxis], supports[:, np.newaxis, :]]
+            systems[:, :, :k, k] = -1
+            systems[:, :, k, :k] = 1
+            right_hand_side: np.ndarray = np.zeros((count, len(supports), k + 1, 1))
+            right_hand_side[:, :, k] = 1
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                regular: np.ndarray = np.linalg.cond(systems) < 1 / self._tolerance
+            matrix_index, support_index = np.nonzero(regular)
+            if len(matrix_index) == 0:
+                continue
+
+            weights: np.ndarray = np.linalg.solve(systems[matrix_index, support_index], right_hand_side[matrix_index, support_index])[:, :k, 0]
+            interior: np.ndarray = np.all(weights > self._tolerance, axis=1)
+
+            face_points: np.ndarray = np.zeros((int(interior.sum()), self._dimension))
+            np.put_along_axis(face_points, supports[support_index[interior]], weights[interior], axis=1)
+            points.append(face_points)
+            indices.append(matrix_index[interior])
+
+        if not points:
+            return (np.empty((0, self._dimension)), np.empty(0, dtype=int))
+        return (np.concatenate(points), np.concatenate(indices))
+
+    def __newton(self, rows: slice, iterations: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+        game_matrices: np.ndarray = self._game_matrices[rows][:, np.newaxis]
+        mutation_matrix: Optional[np.ndarray] = self.__mutation(rows)
+        if mutation_matrix is not None and mutation_matrix.ndim == 3:
+            mutation_matrix = mutation_matrix[:, np.newaxis]
+        count: int = game_matrices.shape[0]
+
+        #The barycentre plus `starts` uniformly random points of the simplex for every matrix, and the states the dynamics
+        #carry them to, since random starts alone rarely land in the basin of Newton's method around an attractor.
+        rng: np.random.Generator = np.random.default_rng(self._seed)
+        starts: np.ndarray = np.concatenate([np.full((count, 1, self._dimension), 1 / self._dimension),
+                                             rng.dirichlet(np.ones(self._dimension), size=(count, self._starts))], axis=1)
+        starts = np.concatenate([starts, _flow(starts, game_matrices, mutation_matrix, self._flow_steps)], axis=1)
+        basis: np.ndarray = _tangent_basis(self._dimension)
+
+        population: np.ndarray = starts
+        for _ in range(iterations):
+            derivative: np.ndarray = _stack_derivative(population, game_matrices, mutation_matrix)
+            jacobian: np.ndarray = replicator_mutator_jacobian(population, game_matrices, mutation_matrix)
+
+            if np.max(np.abs(derivative)) < self._tolerance:
+                break
+
+            #Newton step within the simplex: solve (B^T J B) w = -B^T F and move by B w.
+            #A batch holding a singular Jacobian falls back to the (much slower) pseudo-inverse.
+            tangent_jacobian: np.ndarray = basis.T @ jacobian @ basis
+            right_hand_side: np.ndarray = -(derivative @ basis)[..., np.newaxis]
+            try:
+                step: np.ndarray = np.linalg.solve(tangent_jacobian, right_hand_side)
+            except np.linalg.LinAlgError:
+                step = np.linalg.pinv(tangent_jacobian) @ right_hand_side
+            population = np.maximum(population + (basis @ step)[..., 0], 0)
+            population /= population.sum(axis=-1, keepdims=True)
+
+        derivative = _stack_derivative(population, game_matrices, mutation_matrix)
+        matrix_index, start_index = np.nonzero(np.max(np.abs(derivative), axis=-1) < np.sqrt(self._tolerance))
+        points: np.ndarray = population[matrix_index, start_index]
+
+        #Starts converging to the same rest point are merged.
+        keys: np.ndarray = np.concatenate([matrix_index[:, np.newaxis], np.round(points / np.sqrt(self._tolerance))], axis=1)
+        _, unique = np.unique(keys, axis=0, return_index=True)
+        return (points[unique], matrix_index[unique])
+
+    def __classify(self, points: np.ndarray, indices: np.ndarray) -> Dict[str, np.ndarray]:
+        game_matrices: np.ndarray = self._game_matrices[indices]
+        mutation_matrix: Optional[np.ndarray] = self._mutation_matrix
+        if mutation_matrix is not None and mutation_matrix.ndim == 3:
+            mutation_matrix = mutation_matrix[indices]
+
+        jacobians: np.ndarray = replicator_mutator_jacobian(points, game_matrices, mutation_matrix)
+        eigenvalues: np.ndarray = tangent_eigenvalues(jacobians)
+
+        fitness: np.ndarray = np.einsum("nij,nj->ni", game_matrices, points)
+        average_fitness: np.ndarray = np.sum(points * fitness, axis=1, keepdims=True)
+        nash: np.ndarray = np.all(fitness <= average_fitness + self._tolerance, axis=1)
+
+        ess: Optional[np.ndarray] = None
+        if self._mutation_matrix is None:
+            #Negative definiteness of sym(A) on {z : supp(z) within the best replies, sum(z) = 0}, tested through
+            #D (sym(A) - c 11^T) D - c (I - D) with D the best-reply mask and c large (Finsler's lemma).
+            best_replies: np.ndarray = (fitness >= average_fitness - self._tolerance).astype(float)
+            symmetric: np.ndarray = (game_matrices + np.swapaxes(game_matrices, 1, 2)) / 2
+            penalty: float = 1e3 * self._dimension * (1 + np.max(np.abs(self._game_matrices)))
+            mask: np.ndarray = best_replies[:, :, np.newaxis] * best_replies[:, np.newaxis, :]
+            quadratic: np.ndarray = mask * (symmetric - penalty) - penalty * np.identity(self._dimension) * (1 - best_replies)[:, np.newaxis, :]
+            ess = nash & (np.linalg.eigvalsh(quadratic)[:, -1] < -self._tolerance)
+
+        return {"rest_points": points,
+                "matrix_indices": indices,
+                "jacobians": jacobians,
+                "eigenvalues": eigenvalues,
+                "stability": classify_stability(eigenvalues, self._tolerance),
+                "nash": nash,
+                "ess": ess}
@@ -0,0 +1,349 @@
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Tuple, Dict, Any
+
+#Finite-population counterparts of `Model`: many independent realisations of a population of `population_size`
+#individuals are advanced together, one (realisations, dimension) array of counts per NumPy step.
+#
+#Fitness follows the usual linear selection scheme f = 1 - w + w * (A x), with x the type frequencies and w the
+#`selection_intensity`; negative fitness is clipped to 0. Offspring then mutate according to the rows of `mutation_matrix`.
+#  - "wright-fisher": every generation is resampled at once with a multinomial draw (binomial for two types).
+#  - "moran": one birth (fitness-proportional) and one death (uniform) per step; a generation is `population_size` steps.
+#For weak selection the mean frequencies follow the replicator dynamics of `Model` with time rescaled by w.
+
+
+def _initial_counts(initial_population: np.ndarray, population_size: int) -> np.ndarray:
+
+    #Rounds frequencies to counts summing to `population_size`, giving the remainder to the largest fractional parts.
+    exact: np.ndarray = np.asarray(initial_population, dtype=float).ravel() / np.sum(initial_population) * population_size
+    counts: np.ndarray = np.floor(exact).astype(np.int64)
+    remainder: int = population_size - int(counts.sum())
+    counts[np.argsort(counts - exact)[:remainder]] += 1
+    return counts
+
+
+def _birth_probabilities(counts: np.ndarray, game_matrix: np.ndarray, mutation_matrix: Optional[np.ndarray],
+                         population_size: int, selection_intensity: float) -> np.ndarray:
+
+    #Probability that an offspring is of each type, for every realisation at once.
+    frequencies: np.ndarray = counts / population_size
+    fitness: np.ndarray = np.maximum(1 - selection_intensity + selection_intensity * (frequencies @ game_matrix.T), 0)
+    weights: np.ndarray = frequencies * fitness
+
+    #Without any positive fitness left, offspring are drawn neutrally.
+    totals: np.ndarray = weights.sum(axis=1, keepdims=True)
+    neutral: np.ndarray = totals[:, 0] <= 0
+    weights[neutral], totals[neutral] = frequencies[neutral], 1
+    probabilities: np.ndarray = weights / totals
+
+    if mutation_matrix is not None:
+        probabilities = probabilities @ mutation_matrix
+    return probabilities
+
+
+def _categorical(rng: np.random.Generator, probabilities: np.ndarray) -> np.ndarray:
+
+    #One draw per row of a (rows, dimension) probability array.
+    cumulative: np.ndarray = np.cumsum(probabilities, axis=1)
+    draws: np.ndarray = rng.random((len(probabilities), 1)) * cumulative[:, -1:]
+    return np.minimum((cumulative <= draws).sum(axis=1), probabilities.shape[1] - 1)
+
+
+def _simulate(game_matrix: np.ndarray,
+              mutation_matrix: Optional[np.ndarray],
+              initial_counts: np.ndarray,
+              realisations: int,
+              population_size: int,
+              record_generations: np.ndarray,
+              process: str,
+              selection_intensity: float,
+              seed: np.random.SeedSequence
+    ) -> Dict[str, np.ndarray]:
+
+    #Runs `realisations` populations on one random stream and returns running sums at every recorded generation, so
+    #chunks can be merged without keeping their trajectories.
+    rng: np.random.Generator = np.random.default_rng(seed)
+    dimension: int = len(initial_counts)
+    counts: np.ndarray = np.tile(initial_counts, (realisations, 1))
+    rows: np.ndarray = np.arange(realisations)
+
+    totals: np.ndarray = np.zeros((len(record_generations), dimension))
+    squares: np.ndarray = np.zeros((len(record_generations), dimension))
+    avg_fitness: np.ndarray = np.zeros(len(record_generations))
+    fixation_types: np.ndarray = np.full(realisations, -1)
+    fixation_generations: np.ndarray = np.full(realisations, np.nan)
+
+    def record(sample: int) -> None:
+        frequencies: np.ndarray = counts / population_size
+        totals[sample] += frequencies.sum(axis=0)
+        squares[sample] += (frequencies ** 2).sum(axis=0)
+        avg_fitness[sample] += np.einsum("ij,ij->", frequencies, frequencies @ game_matrix.T)
+
+    def check_fixation(generation: int) -> None:
+        fixed: np.ndarray = (counts.max(axis=1) == population_size) & (fixation_types < 0)
+        fixation_types[fixed] = counts[fixed].argmax(axis=1)
+        fixation_generations[fixed] = generation
+
+    check_fixation(0)
+    sample: int = 0
+    for generation in range(record_generations[-1] + 1):
+        while sample < len(record_generations) and record_generations[sample] == generation:
+            record(sample)
+            sample += 1
+        if generation == record_generations[-1]:
+            break
+
+        #Without mutation a fixed population never changes again, so the remaining samples can be filled in directly.
+        if mutation_matrix is None and np.all(fixation_types >= 0):
+            while sample < len(record_generations):
+                record(sample)
+                sample += 1
+            break
+
+        if process == "wright-fisher":
+            probabilities: np.ndarray = _birth_probabilities(counts, game_matrix, mutation_matrix, population_size, selection_intensity)
+            if dimension == 2:
+                counts[:, 0] = rng.binomial(population_size, probabilities[:, 0])
+                counts[:, 1] = population_size - counts[:, 0]
+            else:
+                counts = rng.multinomial(population_size, probabilities)
+        else:
+            for _ in range(population_size):
+                births: np.ndarray = _categorical(rng, _birth_probabilities(counts, game_matrix, mutation_matrix, population_size, selection_intensity))
+                deaths: np.ndarray = _categorical(rng, counts.astype(float))
+                counts[rows, births] += 1
+                counts[rows, deaths] -= 1
+
+        check_fixation(generation + 1)
+
+    return {"totals": totals,
+            "squares": squares,
+            "avg_fitness": avg_fitness,
+            "final_counts": counts,
+            "fixation_types": fixation_types,
+            "fixation_generations": fixation_generations}
+
+
+def _simulate_task(arguments: Tuple) -> Dict[str, np.ndarray]:
+    return _simulate(*arguments)
+
+
+class StochasticEnsemble:
+
+    def __error_check(self,
+                      game_matrix: Any,
+                      initial_population: Any,
+                      population_size: Any,
+                      realisations: Any,
+                      generations: Any,
+                      mutation_matrix: Any,
+                      process: Any,
+                      selection_intensity: Any
+        ) -> Tuple[bool, Exception]:
+
+        #Check input types:
+        if not isinstance(game_matrix, np.ndarray):
+            return (False, ValueError("`game_matrix` must be of type `numpy.ndarray`."))
+
+        if not isinstance(initial_population, np.ndarray):
+            return (False, ValueError("`initial_population` must be of type `numpy.ndarray`."))
+
+        if mutation_matrix is not None and not isinstance(mutation_matrix, np.ndarray):
+            return (False, ValueError("`mutation_matrix` must either be of type `np.ndarray` or `None`."))
+
+        for name, value in (("population_size", population_size), ("realisations", realisations), ("generations", generations)):
+            if not isinstance(value, int) or value <= 0:
+                return (False, ValueError("`{}` must be a positive integer.".format(name)))
+
+        if process not in ("wright-fisher", "moran"):
+            return (False, ValueError("`process` must either be \"wright-fisher\" or \"moran\"."))
+
+        if not isinstance(selection_intensity, (int, float)) or not 0 <= selection_intensity <= 1:
+            return (False, ValueError("`selection_intensity` must be a number between 0 and 1."))
+
+        #Check whether game_matrix dimensions agree:
+        game_num_of_rows, game_num_of_cols = game_matrix.shape
+
+        if game_num_of_rows != game_num_of_cols:
+            return (False, ValueError("`game_matrix` dimensions do not agree."))
+
+        if initial_population.size != game_num_of_rows or np.any(initial_population < 0):
+            return (False, ValueError("`initial_population` must hold one non-negative frequency per type."))
+
+        if mutation_matrix is not None and mutation_matrix.shape != game_matrix.shape:
+            return (False, ValueError("`mutation_matrix` dimensions are not proper."))
+
+        return (True, None)
+
+    def __init__(self, game_matrix: np.ndarray,
+                 initial_population: np.ndarray,
+                 population_size: int,
+                 realisations: int,
+                 generations: int,
+                 sampling_frequency: Optional[int] = None,
+                 mutation_matrix: Optional[np.ndarray] = None,
+                 process: Optional[str] = "wright-fisher",
+                 selection_intensity: Optional[float] = 1.0,
+                 seed: Optional[int] = None,
+                 workers: Optional[int] = 1,
+                 chunk_size: Optional[int] = 1024,
+                 run_checks: Optional[bool] = False
+    ) -> None:
+
+        if run_checks is True:
+            report = self.__error_check(game_matrix, initial_population, population_size, realisations, generations,
+                                        mutation_matrix, process, selection_intensity)
+
+            if report[0] is False:
+                raise report[1]
+
+        #Initialize class properties;
+        self._game_matrix: np.ndarray = game_matrix
+        self._mutation_matrix: Optional[np.ndarray] = mutation_matrix
+        self._dimension: int = game_matrix.shape[0]
+        self._population_size: int = population_size
+        self._realisations: int = realisations
+        self._process: str = process
+        self._initial_counts: np.ndarray = _initial_counts(initial_population, population_size)
+
+        #Generations at which the ensemble is recorded, evenly spread over [0, generations] (every generation by default).
+        samples: int = generations + 1 if sampling_frequency is None else min(sampling_frequency, generations + 1)
+        self._record_generations: np.ndarray = np.unique(np.round(np.linspace(0, generations, samples)).astype(int))
+        self._timepoints: np.ndarray = self._record_generations.astype(float)
+        self._sampling_frequency: int = len(self._timepoints)
+        self._horizon: float = float(generations)
+
+        #Realisations are split into fixed chunks, each with its own stream spawned from `seed`, so results for a seed do not
+        #depend on `workers`. `workers` processes are used (all cores if `None`); `workers=1` runs in this process.
+        chunks: List[int] = [min(chunk_size, realisations - start) for start in range(0, realisations, chunk_size)]
+        streams: List[np.random.SeedSequence] = np.random.SeedSequence(seed).spawn(len(chunks))
+        tasks: List[Tuple] = [(game_matrix, mutation_matrix, self._initial_counts, chunk, population_size, self._record_generations,
+                               process, selection_intensity, stream) for chunk, stream in zip(chunks, streams)]
+
+        if workers == 1:
+            results: List[Dict[str, np.ndarray]] = [_simulate_task(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_simulate_task, tasks))
+
+        mean: np.ndarray = sum(result["totals"] for result in results) / realisations
+        variance: np.ndarray = np.maximum(sum(result["squares"] for result in results) / realisations - mean ** 2, 0)
+
+        #Stored as contiguous (dimension, sampling_frequency) arrays, like `Model`, so a `Visualizer` can plot the ensemble mean.
+        self._population_evolution: np.ndarray = np.ascontiguousarray(mean.T)
+        self._population_std: np.ndarray = np.ascontiguousarray(np.sqrt(variance).T)
+        self._avg_fitness_evolution: np.ndarray = sum(result["avg_fitness"] for result in results) / realisations
+        self._final_counts: np.ndarray = np.concatenate([result["final_counts"] for result in results])
+        self._fixation_types: np.ndarray = np.concatenate([result["fixation_types"] for result in results])
+        self._fixation_generations: np.ndarray = np.concatenate([result["fixation_generations"] for result in results])
+
+        self._fitness_evolution: Optional[np.ndarray] = None
+        self._derivative_evolution: Optional[np.ndarray] = None
+
+    @property
+    def size(self) -> int:
+        return self._realisations
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    @property
+    def population_size(self) -> int:
+        return self._population_size
+
+    @property
+    def process(self) -> str:
+        return self._process
+
+    @property
+    def sampling_frequency(self) -> int:
+        return self._sampling_frequency
+
+    #Time is measured in generations.
+    @property
+    def horizon(self) -> float:
+        return self._horizon
+
+    @property
+    def timepoints(self) -> np.ndarray:
+        return self._timepoints
+
+    @property
+    def game_matrix(self) -> np.ndarray:
+        return self._game_matrix
+
+    @property
+    def mutation_matrix(self) -> Optional[np.ndarray]:
+        return self._mutation_matrix
+
+    @property
+    def initial_counts(self) -> np.ndarray:
+        return self._initial_counts
+
+    #Mean frequency of every type over the realisations, shape (dimension, sampling_frequency).
+    @property
+    def population_evolution(self) -> np.ndarray:
+        return self._population_evolution
+
+    #Standard deviation of every type's frequency over the realisations, shape (dimension, sampling_frequency).
+    @property
+    def population_std(self) -> np.ndarray:
+        return self._population_std
+
+    #Rate of change of the mean frequencies per generation.
+    @property
+    def derivative_evolution(self) -> np.ndarray:
+        if self._derivative_evolution is None:
+            self._derivative_evolution = np.gradient(self._population_evolution, self._timepoints, axis=1) if self._sampling_frequency > 1 \
+                                         else np.zeros_like(self._population_evolution)
+        return self._derivative_evolution
+
+    #Payoff is linear in the frequencies, so the mean payoff of each type is `game_matrix` applied to the mean frequencies.
+    @property
+    def fitness_evolution(self) -> np.ndarray:
+        if self._fitness_evolution is None:
+            self._fitness_evolution = self._game_matrix @ self._population_evolution
+        return self._fitness_evolution
+
+    #Mean over the realisations of each population's average payoff.
+    @property
+    def avg_fitness_evolution(self) -> np.ndarray:
+        return self._avg_fitness_evolution
+
+    @property
+    def final_population_percentages(self) -> np.ndarray:
+        return self._population_evolution[:, -1]
+
+    #Counts at the last generation, one row per realisation, for the spread of outcomes.
+    @property
+    def final_counts(self) -> np.ndarray:
+        return self._final_counts
+
+    #Type each realisation first fixed at (the whole population of one type), or -1 if it never fixed.
+    @property
+    def fixation_types(self) -> np.ndarray:
+        return self._fixation_types
+
+    #Generation of first fixation, `nan` if the realisation never fixed.
+    @property
+    def fixation_generations(self) -> np.ndarray:
+        return self._fixation_generations
+
+    #Fraction of realisations that fixed at each type within the horizon.
+    @property
+    def fixation_probabilities(self) -> np.ndarray:
+        return np.bincount(self._fixation_types[self._fixation_types >= 0], minlength=self._dimension) / self._realisations
+
+    @property
+    def population_percentage_extrema(self) -> Tuple[float, float]:
+        return (self._population_evolution.min(), self._population_evolution.max())
+
+    @property
+    def population_derivative_extrema(self) -> Tuple[float, float]:
+        return (self.derivative_evolution.min(), self.derivative_evolution.max())
+
+    @property
+    def fitness_extrema(self) -> Tuple[float, float]:
+        return (self.fitness_evolution.min(), self.fitness_evolution.max())
@@ -0,0 +1,256 @@
+import numpy as np
+
+from .model import Model, _dormand_prince_steps, _dense_output, _to_simplex, _apply, _mutate
+from typing import Optional, Tuple, Dict, Iterator, Callable, Union, Any
+
+class TrajectoryStream:
+
+    def __error_check(self,
+                      game_matrix: Any,
+                      initial_population: Any,
+                      sampling_frequency: Any,
+                      mutation_matrix: Any,
+                      chunk_size: Any,
+                      thresholds: Any
+        ) -> Tuple[bool, Exception]:
+
+        if not isinstance(game_matrix, np.ndarray) or game_matrix.ndim != 2 or game_matrix.shape[0] != game_matrix.shape[1]:
+            return (False, ValueError("`game_matrix` must be a square `numpy.ndarray`."))
+
+        if not isinstance(initial_population, np.ndarray) or initial_population.shape != (game_matrix.shape[0],):
+            return (False, ValueError("`initial_population` must be a `numpy.ndarray` of shape (dimension,)."))
+
+        if not isinstance(sampling_frequency, int) or sampling_frequency < 2:
+            return (False, ValueError("`sampling_frequency` must be an integer of at least 2."))
+
+        if mutation_matrix is not None and (not isinstance(mutation_matrix, np.ndarray) or mutation_matrix.shape != game_matrix.shape):
+            return (False, ValueError("`mutation_matrix` must either be `None` or a `numpy.ndarray` shaped like `game_matrix`."))
+
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            return (False, ValueError("`chunk_size` must be a positive integer."))
+
+        for i in thresholds:
+            if i not in range(0, game_matrix.shape[0]):
+                return (False, ValueError("`thresholds` keys must be in `range(0, dimension)`."))
+
+        return (True, None)
+
+    def __init__(self, game_matrix: np.ndarray,
+                 initial_population: np.ndarray,
+                 sampling_frequency: int,
+                 mutation_matrix: Optional[np.ndarray] = None,
+                 horizon: Optional[float] = 1.0,
+                 rtol: Optional[float] = 1e-6,
+                 atol: Optional[float] = 1e-9,
+                 chunk_size: Optional[int] = 10000,
+                 thresholds: Optional[Dict[int, float]] = None,
+                 sink: Optional[Union[str, Callable[[np.ndarray, np.ndarray], Any]]] = None,
+                 run_checks: Optional[bool] = False
+    ) -> None:
+
+        thresholds = {} if thresholds is None else thresholds
+
+        if run_checks is True:
+            report = self.__error_check(game_matrix, initial_population, sampling_frequency, mutation_matrix, chunk_size, thresholds)
+
+            if report[0] is False:
+                raise report[1]
+
+        #Initialize class properties;
+        self._game_matrix: np.ndarray = game_matrix
+        self._initial_population: np.ndarray = initial_population
+        self._sampling_frequency: int = sampling_frequency
+        self._mutation_matrix: Optional[np.ndarray] = mutation_matrix
+        self._horizon: float = horizon
+        self._rtol: float = rtol
+        self._atol: float = atol
+        self._chunk_size: int = chunk_size
+        self._dimension: int = game_matrix.shape[0]
+
+        #`sink` is either the path of a (sampling_frequency, dimension) `.npy` file to write the trajectory into,
+        #or a callable receiving every chunk as (timepoints, populations).
+        self._sink: Optional[Union[str, Callable[[np.ndarray, np.ndarray], Any]]] = sink
+
+        #Time-to-threshold metrics: the first timepoint at which type i reaches a share of `thresholds[i]`, `nan` until it does.
+        self._thresholds: Dict[int, float] = dict(thresholds)
+        self.__reset()
+
+    @classmethod
+    def from_model(cls, model: Model, **kwargs) -> "TrajectoryStream":
+
+        #Streams the run described by `model`; a model built with `lazy=True` is never integrated in full.
+        #The identity mutation matrix is passed on as `None` (as `Model` stores it), so its product is skipped here too.
+        return cls(model.game_matrix, model.initial_population, model.sampling_frequency, model._mutation_matrix,
+                   horizon=model.horizon, rtol=model._rtol, atol=model._atol, **kwargs)
+
+    def __timepoints(self, start: int, stop: int) -> np.ndarray:
+
+        #Sample k sits at `horizon * k / (sampling_frequency - 1)`, so the full time grid is never allocated.
+        return self._horizon * np.arange(start, stop) / (self._sampling_frequency - 1)
+
+    def __reset(self) -> None:
+
+        #Online summaries, updated chunk by chunk and started afresh by every pass over the stream.
+        self._threshold_times: Dict[int, float] = {i: np.nan for i in self._thresholds}
+        self._samples_seen: int = 0
+        self._population_minima: np.ndarray = np.full(self._dimension, np.inf)
+        self._population_maxima: np.ndarray = np.full(self._dimension, -np.inf)
+        self._derivative_minima: np.ndarray = np.full(self._dimension, np.inf)
+        self._derivative_maxima: np.ndarray = np.full(self._dimension, -np.inf)
+        self._fitness_minima: np.ndarray = np.full(self._dimension, np.inf)
+        self._fitness_maxima: np.ndarray = np.full(self._dimension, -np.inf)
+        self._avg_fitness_sum: float = 0.0
+        self._avg_fitness_extrema: Tuple[float, float] = (np.inf, -np.inf)
+        self._final_population: Optional[np.ndarray] = None
+        self._final_population_derivatives: Optional[np.ndarray] = None
+        self._final_avg_fitness: Optional[float] = None
+
+    def __update(self, timepoints: np.ndarray, populations: np.ndarray) -> None:
+
+        #Same calculations as `Model`, on one (n, d) chunk of the trajectory.
+        fitness: np.ndarray = _apply(self._game_matrix, populations)
+        average_fitness: np.ndarray = np.einsum("ij,ij->i", populations, fitness)
+        growth: np.ndarray = _mutate(fitness * populations, self._mutation_matrix)
+        derivatives: np.ndarray = growth - average_fitness[:, np.newaxis] * populations
+
+        np.minimum(self._population_minima, populations.min(axis=0), out=self._population_minima)
+        np.maximum(self._population_maxima, populations.max(axis=0), out=self._population_maxima)
+        np.minimum(self._derivative_minima, derivatives.min(axis=0), out=self._derivative_minima)
+        np.maximum(self._derivative_maxima, derivatives.max(axis=0), out=self._derivative_maxima)
+        np.minimum(self._fitness_minima, fitness.min(axis=0), out=self._fitness_minima)
+        np.maximum(self._fitness_maxima, fitness.max(axis=0), out=self._fitness_maxima)
+
+        self._avg_fitness_sum += float(average_fitness.sum())
+        self._avg_fitness_extrema = (min(self._avg_fitness_extrema[0], float(average_fitness.min())),
+                                     max(self._avg_fitness_extrema[1], float(average_fitness.max())))
+
+        for i, level in self._thresholds.items():
+            if np.isnan(self._threshold_times[i]):
+                reached: np.ndarray = np.flatnonzero(populations[:, i] >= level)
+                if len(reached) > 0:
+                    self._threshold_times[i] = float(timepoints[reached[0]])
+
+        self._samples_seen += len(timepoints)
+        self._final_population = populations[-1].copy()
+        self._final_population_derivatives = derivatives[-1].copy()
+        self._final_avg_fitness = float(average_fitness[-1])
+
+    def chunks(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+
+        #Yields the trajectory as (timepoints, populations) chunks of at most `chunk_size` samples, populations shaped (n, d).
+        #Only one chunk is held at a time; the chunk buffer is reused, so copy a chunk to keep it past the next iteration.
+        #Each pass recomputes the summaries from scratch, so iterating again does not fold the same samples in twice.
+        self.__reset()
+
+        sink: Optional[np.ndarray] = None
+        if isinstance(self._sink, str):
+            sink = np.lib.format.open_memmap(self._sink, mode="w+", dtype=float, shape=(self._sampling_frequency, self._dimension))
+
+        buffer: np.ndarray = np.empty((self._chunk_size, self._dimension))
+        start: int = 0
+        filled: int = 0
+
+        def emit() -> Tuple[np.ndarray, np.ndarray]:
+            timepoints: np.ndarray = self.__timepoints(start, start + filled)
+            populations: np.ndarray = buffer[:filled]
+            self.__update(timepoints, populations)
+
+            if sink is not None:
+                sink[start:start + filled] = populations
+            elif self._sink is not None:
+                self._sink(timepoints, populations)
+
+            return (timepoints, populations)
+
+        buffer[0] = _to_simplex(np.asarray(self._initial_population, dtype=float))
+        filled = 1
+
+        for t_old, t_new, y_old, _, _, Q in _dormand_prince_steps(self._game_matrix, self._mutation_matrix, self._initial_population,
+                                                                  0.0, self._horizon, self._rtol, self._atol):
+            #Samples covered by this step, in (t_old, t_new].
+            stop: int = min(int(np.floor(t_new / self._horizon * (self._sampling_frequency - 1) + 1e-9)) + 1, self._sampling_frequency)
+
+            while start + filled < stop:
+                count: int = min(stop - start - filled, self._chunk_size - filled)
+                buffer[filled:filled + count] = _dense_output(t_old, t_new, y_old, Q, self.__timepoints(start + filled, start + filled + count))
+                filled += count
+
+                if filled == self._chunk_size:
+                    yield emit()
+                    start += filled
+                    filled = 0
+
+        if filled > 0:
+            yield emit()
+
+        if sink is not None:
+            sink.flush()
+
+    def run(self) -> "TrajectoryStream":
+
+        #Consumes the whole stream, keeping only the online summaries (and whatever the sink stores).
+        for _ in self.chunks():
+            pass
+        return self
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    @property
+    def sampling_frequency(self) -> int:
+        return self._sampling_frequency
+
+    @property
+    def samples_seen(self) -> int:
+        return self._samples_seen
+
+    @property
+    def final_population_percentages(self) -> Optional[np.ndarray]:
+        return self._final_population
+
+    @property
+    def final_population_derivatives(self) -> Optional[np.ndarray]:
+        return self._final_population_derivatives
+
+    @property
+    def final_avg_fitness(self) -> Optional[float]:
+        return self._final_avg_fitness
+
+    @property
+    def mean_avg_fitness(self) -> float:
+        return self._avg_fitness_sum / self._samples_seen if self._samples_seen > 0 else np.nan
+
+    @property
+    def avg_fitness_extrema(self) -> Tuple[float, float]:
+        return self._avg_fitness_extrema
+
+    #Per-type (minima, maxima), each of shape (dimension,).
+    @property
+    def population_percentage_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return (self._population_minima, self._population_maxima)
+
+    @property
+    def population_derivative_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return (self._derivative_minima, self._derivative_maxima)
+
+    @property
+    def fitness_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return (self._fitness_minima, self._fitness_maxima)
+
+    #Overall (min, max), matching the `Model` extrema properties.
+    @property
+    def population_percentage_extrema(self) -> Tuple[float, float]:
+        return (float(self._population_minima.min()), float(self._population_maxima.max()))
+
+    @property
+    def population_derivative_extrema(self) -> Tuple[float, float]:
+        return (float(self._derivative_minima.min()), float(self._derivative_maxima.max()))
+
+    @property
+    def fitness_extrema(self) -> Tuple[float, float]:
+        return (float(self._fitness_minima.min()), float(self._fitness_maxima.max()))
+
+    @property
+    def threshold_times(self) -> Dict[int, float]:
+        return self._threshold_times
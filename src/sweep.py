@@ -0,0 +1,289 @@
+import os
+import json
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from .model import Model, uniform_mutation_matrix
+from .cache import ResultCache
+from typing import Optional, List, Tuple, Dict, Callable, Any
+
+#Summary quantities a sweep can keep, with the shape of one entry given (dimension, sampling_frequency).
+#Names match the `Model` properties they are read from.
+SWEEP_QUANTITIES: Dict[str, Callable[[int, int], Tuple[int, ...]]] = {
+    "final_population_percentages":  lambda d, T: (d,),
+    "final_population_derivatives":  lambda d, T: (d,),
+    "avg_fitness_evolution":         lambda d, T: (T,),
+    "population_percentage_extrema": lambda d, T: (2,),
+    "population_derivative_extrema": lambda d, T: (2,),
+    "fitness_extrema":               lambda d, T: (2,),
+}
+
+#Files making up a sweep directory.
+_SETTINGS_FILE: str = "sweep.json"
+_DONE_FILE: str = "done.npy"
+
+
+class ParameterSweep:
+
+    def __error_check(self,
+                      game_matrix: Any,
+                      mutation_matrix: Any,
+                      game_entries: Any,
+                      game_values: Any,
+                      mutation_rates: Any,
+                      quantities: Any
+        ) -> Tuple[bool, Exception]:
+
+        if not isinstance(game_matrix, np.ndarray) or game_matrix.ndim != 2 or game_matrix.shape[0] != game_matrix.shape[1]:
+            return (False, ValueError("`game_matrix` must be a square `numpy.ndarray`."))
+
+        if mutation_matrix is not None and (not isinstance(mutation_matrix, np.ndarray) or mutation_matrix.shape != game_matrix.shape):
+            return (False, ValueError("`mutation_matrix` must either be `None` or a `numpy.ndarray` shaped like `game_matrix`."))
+
+        if game_values is None and mutation_rates is None:
+            return (False, ValueError("At least one of `game_values` and `mutation_rates` must be given."))
+
+        if game_values is not None:
+            if game_entries is None or np.ndim(game_values) != 2 or np.shape(game_values)[1] != len(game_entries):
+                return (False, ValueError("`game_values` must have shape (points, len(game_entries))."))
+
+            for i, j in game_entries:
+                if not (0 <= i < game_matrix.shape[0] and 0 <= j < game_matrix.shape[1]):
+                    return (False, ValueError("`game_entries` must index into `game_matrix`."))
+
+        if game_values is not None and mutation_rates is not None and len(game_values) != len(mutation_rates):
+            return (False, ValueError("`game_values` and `mutation_rates` must describe the same number of points."))
+
+        for quantity in quantities:
+            if quantity not in SWEEP_QUANTITIES:
+                return (False, ValueError("`quantities` must be a subset of {}.".format(sorted(SWEEP_QUANTITIES))))
+
+        return (True, None)
+
+    def __init__(self, game_matrix: np.ndarray,
+                 initial_population: np.ndarray,
+                 sampling_frequency: int,
+                 mutation_matrix: Optional[np.ndarray] = None,
+                 game_entries: Optional[List[Tuple[int, int]]] = None,
+                 game_values: Optional[np.ndarray] = None,
+                 mutation_rates: Optional[np.ndarray] = None,
+                 quantities: Optional[List[str]] = ["final_population_percentages"],
+                 solver: Optional[str] = "nashpy",
+                 horizon: Optional[float] = 1.0,
+                 rtol: Optional[float] = 1e-6,
+                 atol: Optional[float] = 1e-9,
+                 run_checks: Optional[bool] = False
+    ) -> None:
+
+        if run_checks is True:
+            report = self.__error_check(game_matrix, mutation_matrix, game_entries, game_values, mutation_rates, quantities)
+
+            if report[0] is False:
+                raise report[1]
+
+        #Point k of the sweep sets `game_matrix[game_entries[n]] = game_values[k, n]` and, if `mutation_rates` is given,
+        #uses the mutation matrix `(1 - rate) * I + rate * mutation_matrix` with `rate = mutation_rates[k]`.
+        #Without a base `mutation_matrix`, rates mutate uniformly into every other type.
+        self._game_matrix: np.ndarray = game_matrix
+        self._initial_population: np.ndarray = initial_population
+        self._sampling_frequency: int = sampling_frequency
+        self._mutation_matrix: Optional[np.ndarray] = mutation_matrix
+        self._game_entries: List[Tuple[int, int]] = [] if game_entries is None else [(int(i), int(j)) for i, j in game_entries]
+        self._game_values: Optional[np.ndarray] = None if game_values is None else np.asarray(game_values, dtype=float)
+        self._mutation_rates: Optional[np.ndarray] = None if mutation_rates is None else np.asarray(mutation_rates, dtype=float)
+        self._quantities: List[str] = list(quantities)
+        self._model_settings: Dict[str, Any] = {"solver": solver, "horizon": horizon, "rtol": rtol, "atol": atol}
+
+        self._size: int = len(self._game_values) if self._game_values is not None else len(self._mutation_rates)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def dimension(self) -> int:
+        return self._game_matrix.shape[0]
+
+    @property
+    def quantities(self) -> List[str]:
+        return self._quantities
+
+    def game_matrix_at(self, point: int) -> np.ndarray:
+        return _game_matrix_at(self._game_matrix, self._game_entries, self._game_values, point)
+
+    def mutation_matrix_at(self, point: int) -> Optional[np.ndarray]:
+        return _mutation_matrix_at(self._mutation_matrix, self._mutation_rates, self.dimension, point)
+
+    def model_at(self, point: int) -> Model:
+        return Model(self.game_matrix_at(point), self._initial_population, self._sampling_frequency,
+                     self.mutation_matrix_at(point), lazy=True, **self._model_settings)
+
+    def __settings(self) -> Dict[str, Any]:
+        return {"size": self._size,
+                "dimension": self.dimension,
+                "sampling_frequency": self._sampling_frequency,
+                "game_entries": self._game_entries,
+                "quantities": self._quantities,
+                "model_settings": self._model_settings,
+                "inputs": _inputs_key(self._game_matrix, self._initial_population, self._mutation_matrix,
+                                      self._game_values, self._mutation_rates)}
+
+    def __prepare(self, output_directory: str) -> None:
+
+        #Lays out a fresh sweep directory, or checks that an existing one belongs to this sweep so it can be resumed.
+        settings_path: str = os.path.join(output_directory, _SETTINGS_FILE)
+        settings: Dict[str, Any] = json.loads(json.dumps(self.__settings()))
+
+        if os.path.exists(settings_path):
+            with open(settings_path) as file:
+                if json.load(file) != settings:
+                    raise ValueError("`{}` holds the results of a different sweep.".format(output_directory))
+            return
+
+        os.makedirs(output_directory, exist_ok=True)
+
+        #Inputs are written once and memory-mapped read-only by every worker, so they are never copied per task.
+        np.save(os.path.join(output_directory, "game_matrix.npy"), self._game_matrix)
+        np.save(os.path.join(output_directory, "initial_population.npy"), self._initial_population)
+        if self._mutation_matrix is not None:
+            np.save(os.path.join(output_directory, "mutation_matrix.npy"), self._mutation_matrix)
+        if self._game_values is not None:
+            np.save(os.path.join(output_directory, "game_values.npy"), self._game_values)
+        if self._mutation_rates is not None:
+            np.save(os.path.join(output_directory, "mutation_rates.npy"), self._mutation_rates)
+
+        #Results are preallocated as `.npy` memmaps, one row per point, plus a completion flag per point.
+        for quantity in self._quantities:
+            shape: Tuple[int, ...] = (self._size,) + SWEEP_QUANTITIES[quantity](self.dimension, self._sampling_frequency)
+            result = np.lib.format.open_memmap(os.path.join(output_directory, quantity + ".npy"), mode="w+", dtype=float, shape=shape)
+            result.flush()
+            del result
+
+        done = np.lib.format.open_memmap(os.path.join(output_directory, _DONE_FILE), mode="w+", dtype=np.bool_, shape=(self._size,))
+        done.flush()
+        del done
+
+        #The settings file is written last, so a directory that has one is complete.
+        with open(settings_path, "w") as file:
+            json.dump(settings, file)
+
+    def run(self, output_directory: str, workers: Optional[int] = None, chunk_size: Optional[int] = 64) -> Dict[str, np.ndarray]:
+
+        #Evaluates every point not yet marked done in `output_directory` and returns the results as read-only memmaps.
+        #`workers` processes are used (all cores if `None`); `workers=1` runs in this process.
+        self.__prepare(output_directory)
+
+        done: np.ndarray = np.load(os.path.join(output_directory, _DONE_FILE), mmap_mode="r")
+        pending: np.ndarray = np.flatnonzero(~done)
+        del done
+
+        chunks: List[np.ndarray] = [pending[start:start + chunk_size] for start in range(0, len(pending), chunk_size)]
+
+        if workers == 1:
+            _load_sweep(output_directory)
+            for chunk in chunks:
+                _run_chunk(chunk)
+        elif chunks:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_load_sweep, initargs=(output_directory,)) as executor:
+                for _ in executor.map(_run_chunk, chunks):
+                    pass
+
+        return load_sweep_results(output_directory)
+
+
+def load_sweep_results(output_directory: str) -> Dict[str, np.ndarray]:
+
+    #Memory-maps the results of a (possibly partial) sweep; `done` flags the points that have been evaluated.
+    with open(os.path.join(output_directory, _SETTINGS_FILE)) as file:
+        settings: Dict[str, Any] = json.load(file)
+
+    results: Dict[str, np.ndarray] = {quantity: np.load(os.path.join(output_directory, quantity + ".npy"), mmap_mode="r")
+                                      for quantity in settings["quantities"]}
+    results["done"] = np.load(os.path.join(output_directory, _DONE_FILE), mmap_mode="r")
+    return results
+
+
+def _inputs_key(game_matrix: np.ndarray,
+                initial_population: np.ndarray,
+                mutation_matrix: Optional[np.ndarray],
+                game_values: Optional[np.ndarray],
+                mutation_rates: Optional[np.ndarray]
+    ) -> str:
+
+    #Content hash of every input array, stored with the settings so a sweep directory is only resumed with the inputs it was
+    #started from, and so workers can tell when the `.npy` inputs on disk no longer match it.
+    return ResultCache.key([np.asarray(game_matrix), np.asarray(initial_population), mutation_matrix, game_values, mutation_rates], {})
+
+
+def _game_matrix_at(game_matrix: np.ndarray, game_entries: List[Tuple[int, int]], game_values: Optional[np.ndarray], point: int) -> np.ndarray:
+    if game_values is None:
+        return game_matrix
+
+    game_matrix = np.array(game_matrix)
+    rows, cols = zip(*game_entries)
+    game_matrix[list(rows), list(cols)] = game_values[point]
+    return game_matrix
+
+
+def _mutation_matrix_at(mutation_matrix: Optional[np.ndarray], mutation_rates: Optional[np.ndarray], dimension: int, point: int) -> Optional[np.ndarray]:
+    if mutation_rates is None:
+        return None if mutation_matrix is None else np.asarray(mutation_matrix)
+
+    rate: float = mutation_rates[point]
+    if mutation_matrix is None:
+        return uniform_mutation_matrix(dimension, rate)
+    return (1 - rate) * np.identity(dimension) + rate * np.asarray(mutation_matrix)
+
+
+#State of a sweep inside a worker process, set up once per process by `_load_sweep`.
+_worker_sweep: Dict[str, Any] = {}
+
+
+def _load_sweep(output_directory: str) -> None:
+
+    def optional(name: str) -> Optional[np.ndarray]:
+        path: str = os.path.join(output_directory, name + ".npy")
+        return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+    with open(os.path.join(output_directory, _SETTINGS_FILE)) as file:
+        settings: Dict[str, Any] = json.load(file)
+
+    inputs: Dict[str, Optional[np.ndarray]] = {"game_matrix": np.load(os.path.join(output_directory, "game_matrix.npy"), mmap_mode="r"),
+                                               "initial_population": np.load(os.path.join(output_directory, "initial_population.npy")),
+                                               "mutation_matrix": optional("mutation_matrix"),
+                                               "game_values": optional("game_values"),
+                                               "mutation_rates": optional("mutation_rates")}
+
+    if _inputs_key(**inputs) != settings.get("inputs"):
+        raise ValueError("The inputs stored in `{}` do not match its settings.".format(output_directory))
+
+    _worker_sweep.clear()
+    _worker_sweep.update(settings=settings,
+                         game_entries=[tuple(entry) for entry in settings["game_entries"]],
+                         **inputs,
+                         results={quantity: np.load(os.path.join(output_directory, quantity + ".npy"), mmap_mode="r+")
+                                  for quantity in settings["quantities"]},
+                         done=np.load(os.path.join(output_directory, _DONE_FILE), mmap_mode="r+"))
+
+
+def _run_chunk(points: np.ndarray) -> None:
+    settings: Dict[str, Any] = _worker_sweep["settings"]
+    results: Dict[str, np.ndarray] = _worker_sweep["results"]
+
+    for point in points:
+        model: Model = Model(_game_matrix_at(_worker_sweep["game_matrix"], _worker_sweep["game_entries"], _worker_sweep["game_values"], point),
+                             _worker_sweep["initial_population"],
+                             settings["sampling_frequency"],
+                             _mutation_matrix_at(_worker_sweep["mutation_matrix"], _worker_sweep["mutation_rates"], settings["dimension"], point),
+                             lazy=True,
+                             **settings["model_settings"])
+
+        for quantity in settings["quantities"]:
+            results[quantity][point] = getattr(model, quantity)
+
+    #Results are flushed before their points are marked done, so a crash never leaves a point marked done without its results.
+    for result in results.values():
+        result.flush()
+
+    _worker_sweep["done"][points] = True
+    _worker_sweep["done"].flush()
@@ -1,10 +1,37 @@
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.axes import Axes
 from .model import Model
+from .stochastic import StochasticEnsemble
+from .downsample import minmax_downsample, lttb_downsample
+from .frame_writers import write_frames
+from .profiling import span
 from .config import monster_colors, brief_monster_labels_16
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict, Iterator, Any
+
+#Figures used for rendering to files, one per figure size and process. They are created without pyplot, so no
+#interactive backend (or display) is needed, and are cleared and reused for every file instead of being rebuilt.
+_headless_figures: Dict[Tuple[Tuple[int, int], int], Tuple[Figure, Axes]] = {}
+
+#Plot methods `render_batch` can call, each writing one file per model.
+BATCH_PLOTS: List[str] = ["percentage_plot", "derivative_plot", "fitness_plot", "avg_fitness_plot"]
+
+
+def _headless_figure(figure_size: Tuple[int, int], dpi: int) -> Tuple[Figure, Axes]:
+    if (figure_size, dpi) not in _headless_figures:
+        figure: Figure = Figure(figsize=figure_size, dpi=dpi)
+        FigureCanvasAgg(figure)
+        _headless_figures[(figure_size, dpi)] = (figure, figure.add_subplot())
+
+    figure, ax = _headless_figures[(figure_size, dpi)]
+    ax.clear()
+    return (figure, ax)
 
 class Visualizer:
     
@@ -17,11 +44,14 @@ class Visualizer:
                  line_colors: Optional[List[str]] = monster_colors,
                  line_labels: Optional[List[str]] = brief_monster_labels_16, 
                  animation_frames: Optional[int] = 1000,
+                 downsample: Optional[str] = "minmax",
+                 dpi: Optional[int] = 100,
+                 animation_fps: Optional[int] = 30
     ) -> Tuple[bool, Exception]:
         
         #Check for types
-        if not isinstance(model, Model):
-            return (False, ValueError("`model` must be of type `Model`."))
+        if not isinstance(model, (Model, StochasticEnsemble)):
+            return (False, ValueError("`model` must be of type `Model` or `StochasticEnsemble`."))
 
         if not isinstance(plot_only, List):
             return (False, ValueError("`plot_only` must be of type `list`."))
@@ -44,6 +74,15 @@ class Visualizer:
         if not isinstance(animation_frames, int):
             return (False, ValueError("`animation_frames` must be of type `int`."))
 
+        if downsample not in ("minmax", "lttb", None):
+            return (False, ValueError("`downsample` must be \"minmax\", \"lttb\" or `None`."))
+
+        if not isinstance(dpi, int) or dpi <= 0:
+            return (False, ValueError("`dpi` must be a positive integer."))
+
+        if not isinstance(animation_fps, int) or animation_fps <= 0:
+            return (False, ValueError("`animation_fps` must be a positive integer."))
+
         #Check for values:
         dim = model.dimension
 
@@ -77,6 +116,10 @@ class Visualizer:
                  line_colors: Optional[List[str]] = monster_colors,
                  line_labels: Optional[List[str]] = brief_monster_labels_16, 
                  animation_frames: Optional[int] = 1000,
+                 downsample: Optional[str] = "minmax",
+                 dpi: Optional[int] = 100,
+                 animation_fps: Optional[int] = 30,
+                 profile: Optional[bool] = False,
                  run_checks: Optional[bool] = False
     ) -> None:
 
@@ -88,7 +131,10 @@ class Visualizer:
                                         legend_color,
                                         line_colors,
                                         line_labels,
-                                        animation_frames)
+                                        animation_frames,
+                                        downsample,
+                                        dpi,
+                                        animation_fps)
 
             if report[0] is False:
                 raise report[1]
@@ -105,110 +151,266 @@ class Visualizer:
         self._legend_color: Tuple[float, float, float]          = legend_color
         self._line_colors: List[str]                            = line_colors
         self._line_labels: List[str]                            = line_labels
-        self._timepoints = np.linspace(0, 1, self._model.sampling_frequency)
+        self._timepoints = self._model.timepoints
+        self._dpi: int                                          = dpi
+
+        #Series are decimated to about two samples per horizontal pixel before drawing ("minmax" keeps every bucket's extrema,
+        #"lttb" keeps the visual shape, `None` draws every sample); results are cached per (series, pixel width).
+        self._downsample: Optional[str]                         = downsample
+        self._pixel_width: int                                  = int(figure_size[0] * dpi)
+        self._decimated: Dict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]] = {}
 
         #Need these for animation.
         self._ani_frames: int      = animation_frames if animation_frames > 0 else 1000
-        self._frame_offset: int    = (self._model.sampling_frequency // self._ani_frames)  #Determines how many datapoints will be drawn for each frame.
+        self._ani_fps: int         = animation_fps
+
+        #Frame f reveals every sample up to `self._frame_times[f]`. The line tips are interpolated up to that time,
+        #so animations with more frames than samples still move on every frame.
+        self._frame_times: np.ndarray = np.linspace(self._timepoints[0], self._timepoints[-1], self._ani_frames)
+
+        #With `profile`, the seconds spent in every render phase are accumulated in `timings`.
+        self._timings: Optional[Dict[str, float]] = {} if profile else None
+
+    #Seconds spent per render phase ("visualizer.plot", "visualizer.decimate", ...), including nested phases.
+    #Empty unless the visualizer was built with `profile=True`.
+    @property
+    def timings(self) -> Dict[str, float]:
+        return {} if self._timings is None else dict(self._timings)
+
+    #Interactive plots get a fresh pyplot figure; plots saved to a file reuse this process's headless figure.
+    def __figure(self, save_to: Optional[str]) -> Tuple[Figure, Axes]:
+        if save_to is None:
+            return plt.subplots(figsize = self._figsize, dpi = self._dpi)
+        return _headless_figure(self._figsize, self._dpi)
+
+    #Per-line (x, y) arrays for the plotted types of a series (or the single average fitness line), decimated for the figure width.
+    def _decimate(self, series: str, evolution: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        key: Tuple[str, int] = (series, self._pixel_width)
+
+        if key not in self._decimated:
+            with span("visualizer.decimate", self._timings):
+                rows: np.ndarray = np.atleast_2d(evolution) if series == "avg_fitness" else np.asarray(evolution)[self._plot]
+
+                if self._downsample == "minmax":
+                    self._decimated[key] = minmax_downsample(self._timepoints, rows, self._pixel_width)
+                elif self._downsample == "lttb":
+                    self._decimated[key] = lttb_downsample(self._timepoints, rows, 2 * self._pixel_width)
+                else:
+                    self._decimated[key] = (np.broadcast_to(self._timepoints, rows.shape), rows)
+
+        return self._decimated[key]
+
+    #Shows the figure, or writes it to `save_to` (format taken from the extension, e.g. .png, .svg or .pdf).
+    def __finish(self, fig: Figure, save_to: Optional[str]) -> None:
+        if save_to is None:
+            plt.show()
+            plt.close(fig=fig)
+        else:
+            with span("visualizer.savefig", self._timings):
+                fig.savefig(save_to)
 
     #General Plotting Method
-    def _plotter(self, evolution: List, y_label: str, legend: Optional[bool] = True, label_numbers: Optional[bool] = True) -> None:
-        
-        fig, ax = plt.subplots(figsize = self._figsize)
-        ax.set(xlim = [0, 1], xlabel = "Time", ylabel = y_label, facecolor = self._background_color)
+    def _plotter(self, evolution: List, y_label: str, legend: Optional[bool] = True, label_numbers: Optional[bool] = True, save_to: Optional[str] = None, series: Optional[str] = None) -> None:
+        with span("visualizer.plot", self._timings):
+            fig, ax = self.__figure(save_to)
+            ax.set(xlim = [0, self._model.horizon], xlabel = "Time", ylabel = y_label, facecolor = self._background_color)
 
-        for i in self._plot:
-            plt.plot(self._timepoints, evolution[i], color = self._line_colors[i], label= str(i) + ". " + self._line_labels[i] if label_numbers else self._line_labels[i])
-        
-        if legend:
-            plt.legend(facecolor = self._legend_color, loc="upper left")
-     
-        plt.show()
-        plt.close(fig=fig)
+            xx_data, yy_data = self._decimate(y_label if series is None else series, evolution)
+
+            for line, i in enumerate(self._plot):
+                ax.plot(xx_data[line], yy_data[line], color = self._line_colors[i], label= str(i) + ". " + self._line_labels[i] if label_numbers else self._line_labels[i])
+
+            if legend:
+                ax.legend(facecolor = self._legend_color, loc="upper left")
+
+            self.__finish(fig, save_to)
 
     #Plots Population Percentage Vs Time
-    def percentage_plot(self, legend: Optional[bool] = True, label_numbers: Optional[bool] = True) -> None:
-        self._plotter(self._model.population_evolution, y_label="Population Percentage", legend=legend, label_numbers=label_numbers)
+    def percentage_plot(self, legend: Optional[bool] = True, label_numbers: Optional[bool] = True, save_to: Optional[str] = None) -> None:
+        self._plotter(self._model.population_evolution, y_label="Population Percentage", legend=legend, label_numbers=label_numbers, save_to=save_to, series="population")
 
     #Plots Population Derivative Vs Time
-    def derivative_plot(self, legend: Optional[bool] = True, label_numbers: Optional[bool] = True ) -> None:
-        self._plotter(self._model.derivative_evolution, y_label="Population Derivative", legend=legend, label_numbers=label_numbers)
+    def derivative_plot(self, legend: Optional[bool] = True, label_numbers: Optional[bool] = True, save_to: Optional[str] = None) -> None:
+        self._plotter(self._model.derivative_evolution, y_label="Population Derivative", legend=legend, label_numbers=label_numbers, save_to=save_to, series="derivative")
 
     #Plots Fitness Vs Time
-    def fitness_plot(self, legend: Optional[bool] = True, label_numbers: Optional[bool] = True ) -> None:
-        self._plotter(self._model.fitness_evolution, y_label="Fitness", legend=legend, label_numbers=label_numbers)
+    def fitness_plot(self, legend: Optional[bool] = True, label_numbers: Optional[bool] = True, save_to: Optional[str] = None) -> None:
+        self._plotter(self._model.fitness_evolution, y_label="Fitness", legend=legend, label_numbers=label_numbers, save_to=save_to, series="fitness")
 
     #Plots Avg Fitness Vs Time
-    def avg_fitness_plot(self) -> None:
+    def avg_fitness_plot(self, save_to: Optional[str] = None) -> None:
+        with span("visualizer.plot", self._timings):
+            fig, ax = self.__figure(save_to)
+            ax.set(xlim = [0, self._model.horizon], xlabel = "Time", ylabel = "Average Fitness", facecolor = self._background_color)
 
-        fig, ax = plt.subplots(figsize = self._figsize)
-        ax.set(xlim = [0, 1], xlabel = "Time", ylabel = "Average Fitness", facecolor = self._background_color)
+            xx_data, yy_data = self._decimate("avg_fitness", self._model.avg_fitness_evolution)
+            ax.plot(xx_data[0], yy_data[0], color = "#4169e1")
 
-        for i in self._plot:
-            plt.plot(self._timepoints, self._model.avg_fitness_evolution, color = "#4169e1")
-        
-        plt.show()
-        plt.close(fig=fig)
+            self.__finish(fig, save_to)
+
+    #Precomputed frame mapping for (decimated) lines: how many samples of each line every frame reveals,
+    #and the interpolated y value of each line's tip at the frame time. Both have shape (lines, frames).
+    def __frame_mapping(self, xx_data: np.ndarray, yy_data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        counts: np.ndarray = np.empty((len(xx_data), self._ani_frames), dtype=int)
+        tips: np.ndarray = np.empty((len(xx_data), self._ani_frames))
+
+        for line in range(len(xx_data)):
+            counts[line] = np.searchsorted(xx_data[line], self._frame_times, side="right")
+            tips[line] = np.interp(self._frame_times, xx_data[line], yy_data[line])
+
+        return (counts, tips)
 
     #Update function for animation functions. 
     def __update(self, 
                  frame, 
-                 yy_data: List, 
+                 xx_data: np.ndarray,
+                 yy_data: np.ndarray, 
+                 counts: np.ndarray,
+                 tips: np.ndarray,
                  lines: List
     ) -> Tuple:
-        for i in self._plot:
-            lines[i].set_xdata(self._timepoints[:frame * self._frame_offset])
-            lines[i].set_ydata(yy_data[i][:frame * self._frame_offset])
+        for line in range(len(lines)):
+            count: int = counts[line, frame]
+            lines[line].set_data(np.append(xx_data[line][:count], self._frame_times[frame]), np.append(yy_data[line][:count], tips[line, frame]))
         return tuple(lines)
 
+    #Streams the animation into `save_to`. The static parts are rendered once; every frame then draws only the segments
+    #revealed since the previous frame on top of the canvas, so the cost of a frame does not grow with the revealed length.
+    def __export(self,
+                 fig: Figure,
+                 ax: Axes,
+                 xx_data: np.ndarray,
+                 yy_data: np.ndarray,
+                 counts: np.ndarray,
+                 tips: np.ndarray,
+                 lines: List,
+                 save_to: str
+    ) -> None:
+
+        def frames() -> Iterator[np.ndarray]:
+            for line in lines:
+                line.set_animated(True)
+            fig.canvas.draw()
+
+            drawn: np.ndarray = np.zeros(len(lines), dtype=int)
+            tip_x: np.ndarray = np.array([xx_data[line][0] for line in range(len(lines))])
+            tip_y: np.ndarray = np.array([yy_data[line][0] for line in range(len(lines))])
+
+            for frame in range(self._ani_frames):
+                for line in range(len(lines)):
+                    count: int = counts[line, frame]
+                    lines[line].set_data(np.concatenate(([tip_x[line]], xx_data[line][drawn[line]:count], [self._frame_times[frame]])),
+                                         np.concatenate(([tip_y[line]], yy_data[line][drawn[line]:count], [tips[line, frame]])))
+                    ax.draw_artist(lines[line])
+                    drawn[line] = count
+
+                tip_x[:] = self._frame_times[frame]
+                tip_y[:] = tips[:, frame]
+                yield np.asarray(fig.canvas.buffer_rgba())
+
+        with span("visualizer.export", self._timings):
+            write_frames(save_to, frames(), self._ani_fps, [self._line_colors[i] for i in self._plot])
+
     #General Animator Method
     def __animator(self, 
                    evolution: List, 
                    y_label: str, 
                    y_lim: Optional[Tuple[float, float]] = None, 
                    legend: Optional[bool] = True, 
-                   label_numbers: Optional[bool] = True
+                   label_numbers: Optional[bool] = True,
+                   save_to: Optional[str] = None,
+                   series: Optional[str] = None
     ) -> None:
+        with span("visualizer.animation", self._timings):
+            fig, ax = self.__figure(save_to)
 
-        fig, ax = plt.subplots(figsize=self._figsize)
-        
-        ax.set(xlim=(0, 1), xlabel="Time", ylabel=y_label, facecolor=self._background_color)
+            ax.set(xlim=(0, self._model.horizon), xlabel="Time", ylabel=y_label, facecolor=self._background_color)
 
-        if y_lim is not None:
-            ax.set_ylim(y_lim)
+            if y_lim is not None:
+                ax.set_ylim(y_lim)
 
-        yy_data = [evolution[i] for i in self._plot]
-        lines = [ax.plot(self._timepoints[0], yy_data[i][0], color=self._line_colors[i], label= str(i) + ". " + self._line_labels[i] if label_numbers else self._line_labels[i])[0] for i in self._plot]
-        
-        if legend:
-            #ax.legend(loc="upper center", fancybox=True, bbox_to_anchor=(-0.165, 1.15), facecolor = self._legend_color, ncol = 4)
-            ax.legend(loc="upper center", fancybox=True, bbox_to_anchor = (0.5, 1.15), facecolor = self._legend_color, ncol = 4)
+            xx_data, yy_data = self._decimate(y_label if series is None else series, evolution)
+            counts, tips = self.__frame_mapping(xx_data, yy_data)
+            lines = [ax.plot(xx_data[line][:1], yy_data[line][:1], color=self._line_colors[i], label= str(i) + ". " + self._line_labels[i] if label_numbers else self._line_labels[i])[0] for line, i in enumerate(self._plot)]
 
-        ani = animation.FuncAnimation(fig=fig, func=self.__update, fargs=(yy_data, lines), frames=self._ani_frames, interval=1, blit=True, repeat=False)
+            if legend:
+                #ax.legend(loc="upper center", fancybox=True, bbox_to_anchor=(-0.165, 1.15), facecolor = self._legend_color, ncol = 4)
+                ax.legend(loc="upper center", fancybox=True, bbox_to_anchor = (0.5, 1.15), facecolor = self._legend_color, ncol = 4)
 
-        plt.show()
-        plt.close(fig=fig)
+            if save_to is None:
+                ani = animation.FuncAnimation(fig=fig, func=self.__update, fargs=(xx_data, yy_data, counts, tips, lines), frames=self._ani_frames, interval=1000 / self._ani_fps, blit=True, repeat=False)
+                plt.show()
+                plt.close(fig=fig)
+            else:
+                #The writer is picked from the extension: .gif, .mp4 (with ffmpeg) or a numbered .png pattern.
+                self.__export(fig, ax, xx_data, yy_data, counts, tips, lines, save_to)
 
     #Animates Population Percentage Vs Time
-    def percentage_animation(self, extr: Optional[bool] = True, legend: Optional[bool] = True, label_numbers: Optional[bool] = True) -> None:
+    def percentage_animation(self, extr: Optional[bool] = True, legend: Optional[bool] = True, label_numbers: Optional[bool] = True, save_to: Optional[str] = None) -> None:
         if not extr:
-            self.__animator(self._model.population_evolution, y_label="Population Percentage", legend=legend, label_numbers=label_numbers)
+            self.__animator(self._model.population_evolution, y_label="Population Percentage", legend=legend, label_numbers=label_numbers, save_to=save_to, series="population")
         else:
             low, high = self._model.population_percentage_extrema
-            self.__animator(self._model.population_evolution, y_lim = (1.15 * low, 1.07 * high), y_label="Population Percentage", legend=legend, label_numbers=label_numbers)
+            self.__animator(self._model.population_evolution, y_lim = (1.15 * low, 1.07 * high), y_label="Population Percentage", legend=legend, label_numbers=label_numbers, save_to=save_to, series="population")
 
     #Animates Population Derivative Vs Time
-    def derivative_animation(self, extr: Optional[bool] = True, legend: Optional[bool] = True, label_numbers: Optional[bool] = True) -> None:
+    def derivative_animation(self, extr: Optional[bool] = True, legend: Optional[bool] = True, label_numbers: Optional[bool] = True, save_to: Optional[str] = None) -> None:
         if not extr:
-            self.__animator(self._model.derivative_evolution, y_label="Population Derivative", legend=legend, label_numbers=label_numbers)
+            self.__animator(self._model.derivative_evolution, y_label="Population Derivative", legend=legend, label_numbers=label_numbers, save_to=save_to, series="derivative")
         else:
             low, high = self._model.population_derivative_extrema
-            self.__animator(self._model.derivative_evolution, y_lim = (1.15 * low, 1.07 * high), y_label="Population Derivative", legend=legend, label_numbers=label_numbers)
+            self.__animator(self._model.derivative_evolution, y_lim = (1.15 * low, 1.07 * high), y_label="Population Derivative", legend=legend, label_numbers=label_numbers, save_to=save_to, series="derivative")
     
     #Animates Population Fitness Vs Time
-    def fitness_animation(self, extr: Optional[bool] = True, legend: Optional[bool] = True, label_numbers: Optional[bool] = True) -> None:
+    def fitness_animation(self, extr: Optional[bool] = True, legend: Optional[bool] = True, label_numbers: Optional[bool] = True, save_to: Optional[str] = None) -> None:
         if not extr:
-            self.__animator(self._model.fitness_evolution, y_label="Fitness", legend=legend, label_numbers=label_numbers)
+            self.__animator(self._model.fitness_evolution, y_label="Fitness", legend=legend, label_numbers=label_numbers, save_to=save_to, series="fitness")
         else:
             low, high = self._model.fitness_extrema
-            self.__animator(self._model.fitness_evolution, y_lim = (low, high), y_label="Fitness", legend=legend, label_numbers=label_numbers)
+            self.__animator(self._model.fitness_evolution, y_lim = (low, high), y_label="Fitness", legend=legend, label_numbers=label_numbers, save_to=save_to, series="fitness")
+
+
+def _render_models(arguments: Tuple[List[Tuple[int, Model]], str, List[str], str, Dict[str, Any]]) -> List[str]:
+    indexed_models, output_directory, plots, file_format, visualizer_kwargs = arguments
+    written: List[str] = []
+
+    for index, model in indexed_models:
+        visualizer: Visualizer = Visualizer(model, **visualizer_kwargs)
+        for plot in plots:
+            path: str = os.path.join(output_directory, "{}_{}.{}".format(index, plot, file_format))
+            getattr(visualizer, plot)(save_to=path)
+            written.append(path)
+
+    return written
+
+
+def render_batch(models: List[Model],
+                 output_directory: str,
+                 plots: Optional[List[str]] = BATCH_PLOTS,
+                 file_format: Optional[str] = "png",
+                 workers: Optional[int] = None,
+                 chunk_size: Optional[int] = 8,
+                 **visualizer_kwargs
+) -> List[str]:
+
+    #Renders `plots` for every model into `output_directory` as `<index>_<plot>.<file_format>` and returns the paths written.
+    #Models are split into chunks of `chunk_size` and rendered in `workers` processes (all cores if `None`, in this process if 1);
+    #every process draws onto one reused headless figure.
+    for plot in plots:
+        if plot not in BATCH_PLOTS:
+            raise ValueError("`plots` must be a subset of {}.".format(BATCH_PLOTS))
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    indexed_models: List[Tuple[int, Model]] = list(enumerate(models))
+    tasks: List[Tuple[List[Tuple[int, Model]], str, List[str], str, Dict[str, Any]]] = [
+        (indexed_models[start:start + chunk_size], output_directory, list(plots), file_format, visualizer_kwargs)
+        for start in range(0, len(indexed_models), chunk_size)]
+
+    if workers == 1:
+        results = map(_render_models, tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_render_models, tasks))
+
+    return [path for written in results for path in written]
\ No newline at end of file
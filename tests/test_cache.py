@@ -0,0 +1,54 @@
+import os
+import time
+import numpy as np
+
+from scipy import sparse
+from typing import List
+from src.cache import ResultCache
+from src.model import Model
+
+
+GAME_MATRIX: np.ndarray = np.array([[0, -1, 1], [1, 0, -1], [-1, 1, 0.]])
+INITIAL_POPULATION: np.ndarray = np.array([0.5, 0.3, 0.2])
+
+
+def test_key_depends_on_content_only():
+    key: str = ResultCache.key([GAME_MATRIX, None], {"solver": "native"})
+    assert key == ResultCache.key([GAME_MATRIX.copy(), None], {"solver": "native"})
+    assert key != ResultCache.key([GAME_MATRIX + 1e-12, None], {"solver": "native"})
+    assert key != ResultCache.key([GAME_MATRIX, GAME_MATRIX], {"solver": "native"})
+    assert key != ResultCache.key([GAME_MATRIX, None], {"solver": "nashpy"})
+    assert ResultCache.key([sparse.csr_array(GAME_MATRIX)], {}) == ResultCache.key([sparse.coo_array(GAME_MATRIX)], {})
+
+
+def test_model_hits_and_misses(tmp_path):
+    cache: ResultCache = ResultCache(str(tmp_path))
+    first: Model = Model(GAME_MATRIX, INITIAL_POPULATION, 100, solver="native", cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    second: Model = Model(GAME_MATRIX, INITIAL_POPULATION, 100, solver="native", cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_array_equal(first.replicator_dynamics, second.replicator_dynamics)
+
+    Model(GAME_MATRIX, INITIAL_POPULATION, 101, solver="native", cache=cache)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_eviction_removes_whole_entries(tmp_path):
+    trajectory: np.ndarray = np.zeros((100, 3))
+    entry_bytes: int = trajectory.nbytes + 1000
+    cache: ResultCache = ResultCache(str(tmp_path), max_bytes=2 * entry_bytes)
+
+    #A sidecar whose trajectory is gone, left behind by an interrupted writer.
+    with open(os.path.join(tmp_path, "orphan.json"), "w") as file:
+        file.write("{}")
+    os.utime(os.path.join(tmp_path, "orphan.json"), (0, 0))
+
+    for index in range(4):
+        cache.put("entry{}".format(index), trajectory + index, {"index": index})
+        time.sleep(0.01)
+
+    names: List[str] = sorted(os.listdir(tmp_path))
+    assert names == ["entry2.json", "entry2.npy", "entry3.json", "entry3.npy"]
+    assert cache.get("entry1") is None
+    assert cache.get("entry3")[1] == {"index": 3}
@@ -0,0 +1,39 @@
+import os
+import json
+
+from src.cli import load_scenarios, run_batch, main
+
+
+def write_scenarios(directory) -> str:
+    scenarios = [{"name": "rps", "game_matrix": [[0, -1, 1], [1, 0, -1], [-1, 1, 0]], "initial_population": [0.5, 0.3, 0.2],
+                  "sampling_frequency": 50, "solver": "native"},
+                 {"name": "broken", "game_matrix": [[0, 1], [1, 0]], "initial_population": [0.5, 0.3, 0.2],
+                  "sampling_frequency": 50, "solver": "native"}]
+    path: str = os.path.join(directory, "scenarios.json")
+    with open(path, "w") as file:
+        json.dump(scenarios, file)
+    return path
+
+
+def test_failed_scenarios_leave_no_directory(tmp_path):
+    output: str = os.path.join(tmp_path, "results")
+    statuses = dict(run_batch(load_scenarios([write_scenarios(tmp_path)]), output, workers=1, plots=False))
+
+    assert statuses["rps"] == "done"
+    assert statuses["broken"].startswith("failed")
+    assert sorted(os.listdir(output)) == ["rps"]
+    assert sorted(os.listdir(os.path.join(output, "rps"))) == ["summary.json", "trajectory.npy"]
+
+
+def test_finished_scenarios_are_skipped_unless_forced(tmp_path):
+    output: str = os.path.join(tmp_path, "results")
+    scenarios = load_scenarios([write_scenarios(tmp_path)])[:1]
+
+    assert run_batch(scenarios, output, workers=1, plots=False) == [("rps", "done")]
+    assert run_batch(scenarios, output, workers=1, plots=False) == [("rps", "skipped")]
+    assert run_batch(scenarios, output, workers=1, plots=False, force=True) == [("rps", "done")]
+    assert os.listdir(output) == ["rps"]
+
+
+def test_main_reports_failures(tmp_path):
+    assert main([write_scenarios(tmp_path), "--output", os.path.join(tmp_path, "results"), "--workers", "1", "--no-plots"]) == 1
@@ -0,0 +1,35 @@
+import numpy as np
+
+from scipy import sparse
+from src import equilibria
+from src.equilibria import EquilibriumAnalysis
+from src.model import Model
+
+
+def test_rock_paper_scissors_equilibrium():
+    game_matrix: np.ndarray = np.array([[0, -1, 1], [1, 0, -1], [-1, 1, 0.]])
+    np.testing.assert_allclose(EquilibriumAnalysis(game_matrix).equilibria, [[1 / 3, 1 / 3, 1 / 3]])
+
+
+def test_from_sparse_model_matches_dense():
+    game_matrix: np.ndarray = np.random.default_rng(0).random((5, 5))
+    model: Model = Model(sparse.csr_array(game_matrix), np.ones(5) / 5, 10, solver="native", lazy=True)
+    np.testing.assert_allclose(EquilibriumAnalysis.from_model(model).equilibria, EquilibriumAnalysis(game_matrix).equilibria)
+
+
+def test_equilibria_cache_keeps_recent_entries_only(monkeypatch):
+    monkeypatch.setattr(equilibria, "_EQUILIBRIA_CACHE_SIZE", 4)
+    monkeypatch.setattr(equilibria, "_equilibria_cache", equilibria.OrderedDict())
+    game_matrices: np.ndarray = np.random.default_rng(1).random((6, 3, 3))
+
+    first: np.ndarray = EquilibriumAnalysis(game_matrices[0]).equilibria
+    for game_matrix in game_matrices[1:4]:
+        EquilibriumAnalysis(game_matrix).equilibria
+
+    #A hit refreshes the entry, so the next insertions evict the second matrix first.
+    assert EquilibriumAnalysis(game_matrices[0]).equilibria is first
+    for game_matrix in game_matrices[4:]:
+        EquilibriumAnalysis(game_matrix).equilibria
+
+    assert len(equilibria._equilibria_cache) == 4
+    assert EquilibriumAnalysis(game_matrices[0]).equilibria is first
@@ -0,0 +1,22 @@
+import numpy as np
+
+from src.extrema import RangeExtrema
+
+
+def test_query_matches_brute_force():
+    rng = np.random.default_rng(0)
+    series: np.ndarray = rng.normal(size=(4, 1000))
+    extrema: RangeExtrema = RangeExtrema(series)
+
+    for start, stop in rng.integers(0, 1000, size=(200, 2)):
+        start, stop = min(start, stop), max(start, stop) + 1
+        minima, maxima = extrema.query(start, stop)
+        np.testing.assert_array_equal(minima, series[:, start:stop].min(axis=1))
+        np.testing.assert_array_equal(maxima, series[:, start:stop].max(axis=1))
+
+
+def test_query_accepts_numpy_integers_and_rows():
+    series: np.ndarray = np.arange(30.0).reshape(3, 10)
+    minima, maxima = RangeExtrema(series).query(np.int64(2), np.int32(9), rows=[0, 2])
+    np.testing.assert_array_equal(minima, [2, 22])
+    np.testing.assert_array_equal(maxima, [8, 28])
@@ -0,0 +1,162 @@
+import os
+import numpy as np
+import pytest
+
+from scipy import sparse
+from typing import List
+from src.cache import ResultCache
+from src.model import Model, solve_replicator_dynamics, uniform_mutation_matrix
+from benchmarks.solver_comparison import reference_solution
+
+
+GAME_MATRIX: np.ndarray = np.array([[0, -1, 1], [1, 0, -1], [-1, 1, 0.]])
+INITIAL_POPULATION: np.ndarray = np.array([0.5, 0.3, 0.2])
+
+
+def test_checks_accept_dense_and_sparse_matrices():
+    mutation_matrix: np.ndarray = np.full((3, 3), 0.05) + 0.85 * np.identity(3)
+    for game_matrix in (GAME_MATRIX, sparse.csr_array(GAME_MATRIX)):
+        for mutation in (None, mutation_matrix, sparse.csr_array(mutation_matrix)):
+            for solver in ("nashpy", "native"):
+                model: Model = Model(game_matrix, INITIAL_POPULATION, 10, mutation, run_checks=True, solver=solver)
+                np.testing.assert_allclose(model.population_evolution.sum(axis=0), 1)
+
+
+@pytest.mark.parametrize("game_matrix, mutation_matrix", [
+    (GAME_MATRIX.tolist(), None),
+    (GAME_MATRIX, np.identity(3).tolist()),
+    (sparse.csr_array(GAME_MATRIX[:2]), None),
+    (sparse.coo_array(GAME_MATRIX[0]), None),
+    (sparse.csr_array(GAME_MATRIX), sparse.identity(4, format="csr")),
+])
+def test_checks_reject_improper_matrices(game_matrix, mutation_matrix):
+    with pytest.raises(ValueError):
+        Model(game_matrix, INITIAL_POPULATION, 10, mutation_matrix, run_checks=True, lazy=True)
+
+
+@pytest.mark.parametrize("initial_population", [INITIAL_POPULATION[np.newaxis], INITIAL_POPULATION[:2], INITIAL_POPULATION.tolist()])
+def test_checks_reject_improper_populations(initial_population):
+    with pytest.raises(ValueError):
+        Model(GAME_MATRIX, initial_population, 10, run_checks=True, lazy=True)
+
+
+def test_native_solver_matches_reference():
+    rng = np.random.default_rng(0)
+    game_matrix: np.ndarray = rng.random((8, 8))
+    initial_population: np.ndarray = rng.dirichlet(np.ones(8))
+    mutation_matrix: np.ndarray = uniform_mutation_matrix(8, 0.01)
+    timepoints: np.ndarray = np.linspace(0, 20, 401)
+
+    expected: np.ndarray = reference_solution(game_matrix, initial_population, timepoints, mutation_matrix)
+    for rtol, atol, error in ((1e-6, 1e-9, 1e-5), (1e-10, 1e-12, 1e-9)):
+        solution: np.ndarray = solve_replicator_dynamics(game_matrix, initial_population, timepoints, mutation_matrix, rtol=rtol, atol=atol)
+        assert np.max(np.abs(solution - expected)) < error
+        np.testing.assert_allclose(solution.sum(axis=1), 1, atol=1e-12)
+
+
+def test_native_solver_handles_stacks():
+    rng = np.random.default_rng(1)
+    game_matrix: np.ndarray = rng.random((4, 4))
+    populations: np.ndarray = rng.dirichlet(np.ones(4), size=3)
+    timepoints: np.ndarray = np.linspace(0, 5, 51)
+
+    stacked: np.ndarray = solve_replicator_dynamics(game_matrix, populations, timepoints, rtol=1e-10, atol=1e-12)
+    assert stacked.shape == (51, 3, 4)
+    for index in range(3):
+        np.testing.assert_allclose(stacked[:, index], reference_solution(game_matrix, populations[index], timepoints, None), atol=1e-8)
+
+
+def test_native_model_matches_nashpy_model():
+    native: Model = Model(GAME_MATRIX + 1, INITIAL_POPULATION, 200, solver="native", horizon=10.0, rtol=1e-10, atol=1e-12)
+    nashpy: Model = Model(GAME_MATRIX + 1, INITIAL_POPULATION, 200, solver="nashpy", horizon=10.0)
+    np.testing.assert_allclose(native.replicator_dynamics, nashpy.replicator_dynamics, atol=1e-6)
+
+
+QUANTITIES: List[str] = ["replicator_dynamics", "timepoints", "population_evolution", "derivative_evolution", "avg_fitness_evolution",
+                         "fitness_evolution", "final_population_percentages", "population_percentage_extrema", "fitness_extrema"]
+
+
+def assert_models_match(model: Model, other: Model, atol: float) -> None:
+    assert model.horizon == other.horizon
+    for quantity in QUANTITIES:
+        np.testing.assert_allclose(getattr(model, quantity), getattr(other, quantity), atol=atol, err_msg=quantity)
+
+
+@pytest.mark.parametrize("mutation_matrix", [None, sparse.csr_array(np.full((3, 3), 0.01) + 0.97 * np.identity(3))])
+def test_extend_matches_full_run(mutation_matrix):
+    settings = {"solver": "native", "rtol": 1e-11, "atol": 1e-13}
+    model: Model = Model(GAME_MATRIX + 1, INITIAL_POPULATION, 101, mutation_matrix, horizon=5.0, **settings)
+    model.population_percentage_extrema
+    model.extend(8.0)
+    model.extend(10.0, samples=40)
+
+    assert_models_match(model, Model(GAME_MATRIX + 1, INITIAL_POPULATION, 201, mutation_matrix, horizon=10.0, **settings), atol=1e-8)
+
+
+@pytest.mark.parametrize("game_matrix", [GAME_MATRIX + 1, sparse.csr_array(GAME_MATRIX + 1)])
+def test_checkpoint_round_trip(tmp_path, game_matrix):
+    mutation_matrix: np.ndarray = np.full((3, 3), 0.01) + 0.97 * np.identity(3)
+    model: Model = Model(game_matrix, INITIAL_POPULATION, 101, mutation_matrix, solver="native", horizon=5.0)
+    model.extend(7.0)
+
+    path: str = os.path.join(tmp_path, "checkpoint.npz")
+    model.save_checkpoint(path)
+    loaded: Model = Model.load_checkpoint(path)
+
+    assert loaded.solver == model.solver
+    assert sparse.issparse(loaded.game_matrix) == sparse.issparse(game_matrix)
+    np.testing.assert_array_equal(loaded.initial_population, model.initial_population)
+    assert_models_match(loaded, model, atol=0)
+
+    #A restored run continues exactly like the original.
+    model.extend(9.0)
+    loaded.extend(9.0)
+    assert_models_match(loaded, model, atol=0)
+
+
+HAWK_DOVE: np.ndarray = np.array([[0, 3], [1, 2.]])
+
+
+def test_convergence_aware_runs_stop_for_the_right_reason():
+    converged: Model = Model(HAWK_DOVE, np.array([0.9, 0.1]), 100, horizon=100.0, convergence_tolerance=1e-6)
+    assert converged.solver == "native"
+    assert converged.stop_reason == "converged"
+    assert converged.convergence_time < converged.horizon < 100
+    assert converged.timepoints[-1] == converged.horizon
+    np.testing.assert_allclose(converged.final_population_percentages, [0.5, 0.5], atol=1e-5)
+
+    #Rock-paper-scissors cycles forever, so it never converges.
+    cycling: Model = Model(GAME_MATRIX, INITIAL_POPULATION, 100, horizon=5.0, convergence_tolerance=1e-6)
+    assert (cycling.stop_reason, cycling.horizon) == ("horizon", 5.0)
+
+    extended: Model = Model(GAME_MATRIX, INITIAL_POPULATION, 100, horizon=5.0, convergence_tolerance=1e-6, max_horizon=12.0)
+    assert (extended.stop_reason, extended.horizon) == ("budget", 12.0)
+    assert np.isnan(extended.convergence_time)
+
+
+def test_convergence_tolerance_solver_rules_do_not_depend_on_checks():
+    for run_checks in (False, True):
+        assert Model(HAWK_DOVE, np.array([0.9, 0.1]), 50, convergence_tolerance=1e-6, run_checks=run_checks, lazy=True).solver == "native"
+        assert Model(HAWK_DOVE, np.array([0.9, 0.1]), 50, run_checks=run_checks, lazy=True).solver == "nashpy"
+        with pytest.raises(ValueError, match="native"):
+            Model(HAWK_DOVE, np.array([0.9, 0.1]), 50, solver="nashpy", convergence_tolerance=1e-6, run_checks=run_checks, lazy=True)
+
+
+def test_convergence_aware_runs_round_trip_through_the_cache(tmp_path):
+    cache: ResultCache = ResultCache(str(tmp_path))
+    settings = {"horizon": 100.0, "convergence_tolerance": 1e-6, "cache": cache}
+    first: Model = Model(HAWK_DOVE, np.array([0.9, 0.1]), 100, **settings)
+    second: Model = Model(HAWK_DOVE, np.array([0.9, 0.1]), 100, **settings)
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert (second.stop_reason, second.horizon, second.convergence_time) == (first.stop_reason, first.horizon, first.convergence_time)
+    np.testing.assert_array_equal(second.timepoints, first.timepoints)
+    np.testing.assert_array_equal(second.replicator_dynamics, first.replicator_dynamics)
+
+
+@pytest.mark.parametrize("samples", [0, -3, 2.5])
+def test_extend_rejects_improper_samples(samples):
+    model: Model = Model(GAME_MATRIX, INITIAL_POPULATION, 11, solver="native")
+    with pytest.raises(ValueError, match="samples"):
+        model.extend(2.0, samples=samples)
+    assert (model.horizon, model.timepoints[-1], len(model.timepoints)) == (1.0, 1.0, 11)
@@ -0,0 +1,83 @@
+import numpy as np
+
+from scipy import sparse
+from src.model import Model, replicator_mutator_derivative, uniform_mutation_matrix
+from src.stability import RestPointAnalysis, replicator_mutator_jacobian
+
+
+def finite_difference_jacobian(population: np.ndarray, game_matrix: np.ndarray, mutation_matrix: np.ndarray, step: float = 1e-6) -> np.ndarray:
+    return np.stack([(replicator_mutator_derivative(population + step * direction, game_matrix, mutation_matrix)
+                      - replicator_mutator_derivative(population - step * direction, game_matrix, mutation_matrix)) / (2 * step)
+                     for direction in np.identity(len(population))], axis=1)
+
+
+def test_jacobian_matches_finite_differences():
+    rng = np.random.default_rng(0)
+    for dimension in (2, 5, 9):
+        game_matrix: np.ndarray = rng.normal(size=(dimension, dimension))
+        population: np.ndarray = rng.dirichlet(np.ones(dimension))
+        for mutation_matrix in (np.identity(dimension), uniform_mutation_matrix(dimension, 0.05)):
+            np.testing.assert_allclose(replicator_mutator_jacobian(population, game_matrix, mutation_matrix),
+                                       finite_difference_jacobian(population, game_matrix, mutation_matrix), atol=1e-7)
+
+        #`None` stands for the identity mutation matrix.
+        np.testing.assert_allclose(replicator_mutator_jacobian(population, game_matrix),
+                                   finite_difference_jacobian(population, game_matrix, np.identity(dimension)), atol=1e-7)
+
+
+def test_stacked_jacobians_match_single_ones():
+    rng = np.random.default_rng(1)
+    game_matrices: np.ndarray = rng.random((4, 3, 3))
+    populations: np.ndarray = rng.dirichlet(np.ones(3), size=4)
+    mutation_matrix: np.ndarray = uniform_mutation_matrix(3, 0.1)
+
+    stacked: np.ndarray = replicator_mutator_jacobian(populations, game_matrices, mutation_matrix)
+    for index in range(4):
+        np.testing.assert_allclose(stacked[index], replicator_mutator_jacobian(populations[index], game_matrices[index], mutation_matrix))
+
+
+def test_known_rest_points():
+    hawk_dove: RestPointAnalysis = RestPointAnalysis(np.array([[0, 3], [1, 2.]]))
+    points, stability = hawk_dove.rest_points_of(0)
+    interior: np.ndarray = np.all(points > 0, axis=1)
+    np.testing.assert_allclose(points[interior], [[0.5, 0.5]])
+    assert list(stability[interior]) == ["stable"]
+    assert sorted(stability[~interior]) == ["unstable", "unstable"]
+    assert hawk_dove.ess[interior].all()
+
+
+def test_face_chunks_do_not_change_results():
+    game_matrices: np.ndarray = np.random.default_rng(2).random((20, 6, 6))
+    whole: RestPointAnalysis = RestPointAnalysis(game_matrices)
+    chunked: RestPointAnalysis = RestPointAnalysis(game_matrices, chunk_size=7)
+
+    np.testing.assert_array_equal(whole.matrix_indices, chunked.matrix_indices)
+    np.testing.assert_allclose(whole.rest_points, chunked.rest_points)
+
+
+def test_mutation_search_finds_attractors():
+    rng = np.random.default_rng(0)
+    game_matrices: np.ndarray = rng.random((30, 5, 5))
+    mutation_matrix: np.ndarray = uniform_mutation_matrix(5, 0.02)
+    analysis: RestPointAnalysis = RestPointAnalysis(game_matrices, mutation_matrix)
+
+    for index in range(len(game_matrices)):
+        model: Model = Model(game_matrices[index], np.ones(5) / 5, 50, mutation_matrix, solver="native", horizon=5000.0)
+        final: np.ndarray = model.final_population_percentages
+
+        #Trajectories ending on a limit cycle have no rest point to find.
+        if np.max(np.abs(replicator_mutator_derivative(final, game_matrices[index], mutation_matrix))) < 1e-8:
+            assert analysis.classify_state(final, index) is not None
+
+
+def test_from_sparse_model_matches_dense():
+    game_matrix: np.ndarray = np.random.default_rng(3).random((4, 4))
+    mutation_matrix: np.ndarray = uniform_mutation_matrix(4, 0.02)
+    for mutation in (None, mutation_matrix):
+        dense: RestPointAnalysis = RestPointAnalysis(game_matrix, mutation)
+        model: Model = Model(sparse.csr_array(game_matrix), np.ones(4) / 4, 10, None if mutation is None else sparse.csr_array(mutation),
+                             solver="native", lazy=True)
+        from_model: RestPointAnalysis = RestPointAnalysis.from_model(model)
+
+        np.testing.assert_allclose(from_model.rest_points, dense.rest_points)
+        np.testing.assert_array_equal(from_model.stability, dense.stability)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from scipy import sparse
+from src.model import Model
+from src.stream import TrajectoryStream
+
+
+def make_model() -> Model:
+    game_matrix: np.ndarray = np.array([[0, -1, 2], [2, 0, -1], [-1, 2, 0.]])
+    return Model(game_matrix, np.array([0.6, 0.3, 0.1]), 500, solver="native", horizon=20.0)
+
+
+def test_summaries_match_model():
+    model: Model = make_model()
+    stream: TrajectoryStream = TrajectoryStream.from_model(model, chunk_size=64, thresholds={2: 0.3}).run()
+
+    assert stream.samples_seen == model.sampling_frequency
+    np.testing.assert_allclose(stream.final_population_percentages, model.final_population_percentages, atol=1e-8)
+    np.testing.assert_allclose(stream.population_percentage_extrema, model.population_percentage_extrema, atol=1e-8)
+    np.testing.assert_allclose(stream.fitness_extrema, model.fitness_extrema, atol=1e-8)
+    np.testing.assert_allclose(stream.mean_avg_fitness, np.mean(model.avg_fitness_evolution), atol=1e-8)
+
+
+def test_iterating_again_restarts_summaries():
+    stream: TrajectoryStream = TrajectoryStream.from_model(make_model(), chunk_size=64, thresholds={2: 0.3})
+    stream.run()
+    first = (stream.samples_seen, stream.mean_avg_fitness, stream.population_percentage_extrema, dict(stream.threshold_times))
+
+    chunks = stream.chunks()
+    next(chunks)
+    assert stream.samples_seen == 64
+
+    for _ in chunks:
+        pass
+    assert (stream.samples_seen, stream.mean_avg_fitness, stream.population_percentage_extrema, dict(stream.threshold_times)) == first
+
+
+def test_from_sparse_model_skips_identity_mutation():
+    model: Model = make_model()
+    sparse_model: Model = Model(sparse.csr_array(model.game_matrix), model.initial_population, model.sampling_frequency,
+                                sparse.identity(3, format="csr"), solver="native", horizon=model.horizon, lazy=True)
+    stream: TrajectoryStream = TrajectoryStream.from_model(sparse_model, chunk_size=64)
+
+    assert stream._mutation_matrix is None
+    np.testing.assert_allclose(stream.run().final_population_percentages, model.final_population_percentages, atol=1e-8)
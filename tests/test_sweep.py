@@ -0,0 +1,53 @@
+import os
+import numpy as np
+import pytest
+
+from src.sweep import ParameterSweep
+
+
+def make_sweep(game_values: np.ndarray) -> ParameterSweep:
+    rng = np.random.default_rng(0)
+    initial_population: np.ndarray = rng.random(3)
+    initial_population /= initial_population.sum()
+
+    return ParameterSweep(rng.random((3, 3)), initial_population, 50, game_entries=[(0, 1)], game_values=game_values,
+                          mutation_rates=np.linspace(0, 0.05, len(game_values)), solver="native", run_checks=True)
+
+
+def test_resume_completes_pending_points(tmp_path):
+    sweep: ParameterSweep = make_sweep(np.linspace(0, 1, 6)[:, np.newaxis])
+    first = sweep.run(str(tmp_path), workers=1)
+    expected: np.ndarray = np.array(first["final_population_percentages"])
+    del first
+
+    done = np.load(os.path.join(tmp_path, "done.npy"), mmap_mode="r+")
+    done[:3] = False
+    done.flush()
+    del done
+
+    resumed = sweep.run(str(tmp_path), workers=1)
+    assert resumed["done"].all()
+    np.testing.assert_allclose(resumed["final_population_percentages"], expected)
+    np.testing.assert_allclose(resumed["final_population_percentages"][4], sweep.model_at(4).final_population_percentages)
+
+
+def test_resume_with_changed_inputs_raises(tmp_path):
+    make_sweep(np.linspace(0, 1, 6)[:, np.newaxis]).run(str(tmp_path), workers=1)
+
+    #Same settings and size, different game values.
+    with pytest.raises(ValueError, match="different sweep"):
+        make_sweep(np.linspace(0, 2, 6)[:, np.newaxis]).run(str(tmp_path), workers=1)
+
+
+def test_workers_reject_modified_inputs(tmp_path):
+    sweep: ParameterSweep = make_sweep(np.linspace(0, 1, 6)[:, np.newaxis])
+    sweep.run(str(tmp_path), workers=1)
+
+    np.save(os.path.join(tmp_path, "game_values.npy"), np.linspace(0, 2, 6)[:, np.newaxis])
+    done = np.load(os.path.join(tmp_path, "done.npy"), mmap_mode="r+")
+    done[:] = False
+    done.flush()
+    del done
+
+    with pytest.raises(ValueError, match="do not match"):
+        sweep.run(str(tmp_path), workers=1)